@@ -1,25 +1,37 @@
-import random
 import sys
+import atexit
 import inspect
 
+from library.startup import import_pygame
+import_pygame() # Before pgzrun imports it
+
 parent_module = sys.modules["__main__"]
-parent_source = inspect.getsource(parent_module)
-sys.modules["__main__"] = sys.modules[__name__]
+if not getattr(sys, "_pgzrun", False): # library.simulation prepares pgzero itself and keeps its __main__
+    sys.modules["__main__"] = sys.modules[__name__]
 import pgzrun
-from pgzero.keyboard import keyboard
-from pgzero.clock import clock
+from pgzero.keyboard import keyboard, keys
+from pgzero import game as pgzero_game
 
 from library.laboratory import pilots, player2
+from library.replay import Recorder
 from library.spaceship import Spaceship, default_update
 from library.asteroid import generate_random_asteroid
 from library.powerups import generate_random_powerup
-from library.gui import Text, Bar
-from library.utils import CollisionInformation, background, world
-from library.pilot import Player1
-# from library.inspector import run_inspection, run_source_code_inspection
-from library.globals import Team, WIDTH, HEIGHT, FPS, ASTEROIDS_PER_SECOND, POWERUPS_PER_SECOND, OBJECTS_LIMIT, WIN_GRAPHIC, LOSE_GRAPHIC, TUTORIAL, USE_INSPECTOR
+from library.gui import Text, Bar, draw_guis
+from library.utils import COLLISIONS, background, world
+from library.broadphase import broadphase, overlaps
+from library.entities import update_stores
+from library.scheduler import scheduler
+from library.rng import rng
+from library.pilot import Player1, pilot_batch
+from library.profiler import profiler
+from library.render import dirty_rects, draw_sprites
+from library.inspector import run_inspection, run_source_code_inspection
+from library.globals import Team, WIDTH, HEIGHT, FPS, ASTEROIDS_PER_SECOND, POWERUPS_PER_SECOND, WIN_GRAPHIC, LOSE_GRAPHIC, TUTORIAL, USE_INSPECTOR, RECORD_REPLAYS, DIRTY_RECTS, BATCH_SPRITES, BATCH_PILOTS
 
 player1 = Player1("Player1")
+headless = False # Set by library.simulation, play() is then a no-op so scripts can be loaded without a window
+replay = None # A library.replay Recorder or ReplayPlayer
 
 if TUTORIAL:
     from library.globals import TUTORIAL_MESSAGE, TUTORIAL_MESSAGE_P2
@@ -27,77 +39,126 @@ if TUTORIAL:
     if player2:
         Text(TUTORIAL_MESSAGE_P2, (WIDTH-300, HEIGHT-160), frames_duration=1200, typing=True, fontsize=14, fontname='future_thin')
 
+@profiler.timed
+def update_pilots():
+
+    if BATCH_PILOTS:
+        pilot_batch.think(pilots, [world.player1])
+        return
+    for pilot in pilots:
+        pilot.think([world.player1])
+
+@profiler.timed
+def update_controls():
+    # Runs after the pilots and the players decided, before anything moves
+    if replay:
+        replay.update()
+
+@profiler.timed
 def update_enviroment():
 
-    if random.random() < (ASTEROIDS_PER_SECOND/FPS):
+    if rng.environment.random() < (ASTEROIDS_PER_SECOND/FPS):
         generate_random_asteroid()
 
-    if random.random() < (POWERUPS_PER_SECOND/FPS):
+    if rng.environment.random() < (POWERUPS_PER_SECOND/FPS):
         generate_random_powerup()
+    world.flush()
 
+@profiler.timed
 def update_objects():
 
-    world.objects = world.objects[:OBJECTS_LIMIT]
-    for obj in world.objects:
-        
-        if obj.collidable:
-            collided_objects = [o for o in world.objects if o.team != obj.team and o.collidable and obj.colliderect(o)] #Exclude same team objects (self is same team) and objects with no collision
-            for collided_object in collided_objects:  
-                obj.collide( CollisionInformation(collided_object) )
-
-    for obj in world.objects:
-        obj.update() 
+    world.budget.enforce()
+    with profiler.section("broadphase"):
+        broadphase.update([obj for obj in world.objects if obj.collidable])
+    with profiler.section("collisions"):
+        for obj in world.objects:
+            
+            if obj.collidable:
+                collided_objects = [o for o in broadphase.candidates(obj) if o.team != obj.team and o.collidable and overlaps(obj, o)] #Exclude same team objects (self is same team) and objects with no collision
+                obj_type = obj.type
+                for collided_object in collided_objects:
+                    response = COLLISIONS.get((obj_type, collided_object.type))
+                    if response:
+                        response(obj, collided_object)
+
+    with profiler.section("object updates"):
+        for obj in world.objects:
+            obj.update() 
+    with profiler.section("stores"):
+        update_stores() # Moves projectiles and asteroids, including the ones created by the updates above
 
     for obj in world.objects:
         if obj.alive == False:
             if (obj == world.player1 or obj == world.player2) and world.end_game == 0:
                 #LOSS
                 world.end_game = -1
-            if sum([e.health for e in world.enemy_spaceships]) <= 0 and world.end_game == 0:
+            if world.enemies_left == 0 and world.end_game == 0:
                 world.end_game = 1
             world.remove_object(obj)
+    world.flush()
 
+@profiler.timed
 def update_gui():
 
     for gui in world.guis:
         gui.update()
+    world.flush()
 
+@profiler.timed
 def update_effects():
 
     for e in world.effects:
         e.update()
+    world.flush()
 
+@profiler.timed
 def draw_enviroment():
 
-    background.draw()
+    if dirty_rects.enabled:
+        dirty_rects.draw_background(drawn_items())
+    else:
+        background.draw()
 
+@profiler.timed
 def draw_objects():
 
     for obj in world.objects:
         obj.draw()
 
+@profiler.timed
 def draw_gui():
 
-    for gui in world.guis:
-        gui.draw()
+    draw_guis(world.guis)
 
+@profiler.timed
 def draw_effects():
 
     for e in world.effects:
         e.draw()
 
+@profiler.timed
+def draw_batched():
+
+    layers = [("actors", world.objects), ("guis", world.guis), ("actors", world.effects)]
+    if end_graphic():
+        layers.append(("actors", [end_graphic()]))
+    draw_sprites(layers)
+
 ##### GAME LOOP #####
+@profiler.frame
 def update():
 
     if keyboard.escape:
         sys.exit(0)
 
-    for pilot in pilots:
-        pilot.think([world.player1])
+    scheduler.advance()
+
+    update_pilots()
 
     player1.read_keyboard()
     if player2:
         player2.read_keyboard() 
+    update_controls()
 
     update_enviroment()
     update_objects()
@@ -105,46 +166,79 @@ def update():
     update_effects()
 
 ##### DRAW LOOP #####
+def end_graphic():
+    if world.end_game == 1:
+        return WIN_GRAPHIC
+    if world.end_game == -1:
+        return LOSE_GRAPHIC
+    return None
+
+def drawn_items():
+    # Everything draw() draws over the background, for the dirty rectangles
+    items = list(world.objects) + list(world.guis) + list(world.effects)
+    if end_graphic():
+        items.append(end_graphic())
+    return items
+
+@profiler.timed
 def draw():
 
     draw_enviroment()
-    draw_objects()
-    draw_gui()
-    draw_effects()
+    if BATCH_SPRITES:
+        draw_batched()
+    else:
+        draw_objects()
+        draw_gui()
+        draw_effects()
 
-    if world.end_game == 1:
-        WIN_GRAPHIC.draw()
-    elif world.end_game == -1:
-        LOSE_GRAPHIC.draw()
+        if end_graphic():
+            end_graphic().draw()
 
-def play():
-    if hasattr(parent_module, "spaceship"):
-        player1spaceship = parent_module.spaceship
-        if hasattr(parent_module, "update"):
-            player1spaceship._update_function = parent_module.update
+    if profiler.overlay:
+        with profiler.section("profiler overlay"):
+            profiler.draw_overlay(pgzero_game.screen)
+        dirty_rects.full_redraw() # The overlay is not one of the drawn items
+
+def on_key_down(key):
+
+    if key == keys.F3:
+        profiler.toggle_overlay()
+    elif key == keys.F4:
+        if profiler.frames:
+            print(f"Profiler trace of {len(profiler.frames)} frames saved to {profiler.save_trace()}")
+        else:
+            profiler.recording = True
+            print("The profiler was not recording, press F4 again to save the frames from now on")
+
+def create_player_spaceship(module):
+    if hasattr(module, "spaceship"):
+        player1spaceship = module.spaceship
+        if hasattr(module, "update"):
+            player1spaceship._update_function = module.update
         else:
             player1spaceship._update_function = default_update
     else:
         player1spaceship = Spaceship(
-            image               = parent_module.image if hasattr(parent_module, "image") else 'spaceships/spaceship_orange1',
-            health              = parent_module.health if hasattr(parent_module, "health") else 1,
-            speed               = parent_module.speed if hasattr(parent_module, "speed") else 0,
-            update_function     = parent_module.update if hasattr(parent_module, "update") else lambda a:a,  
-            ability_function    = parent_module.ability if hasattr(parent_module, "ability") else None,
-            ability_duration    = parent_module.ability_duration if hasattr(parent_module, "ability_duration") else 1,  
-            cooldown_duration   = parent_module.cooldown if hasattr(parent_module, "cooldown") else 10,
-            weapon              = parent_module.weapon if hasattr(parent_module, "weapon") else None,
+            image               = module.image if hasattr(module, "image") else 'spaceships/spaceship_orange1',
+            health              = module.health if hasattr(module, "health") else 1,
+            speed               = module.speed if hasattr(module, "speed") else 0,
+            update_function     = module.update if hasattr(module, "update") else lambda a:a,  
+            ability_function    = module.ability if hasattr(module, "ability") else None,
+            ability_duration    = module.ability_duration if hasattr(module, "ability_duration") else 1,  
+            cooldown_duration   = module.cooldown if hasattr(module, "cooldown") else 10,
+            weapon              = module.weapon if hasattr(module, "weapon") else None,
             team                = Team.PLAYER
         )
+    return player1spaceship
 
+def start_match(player1spaceship, enemy_spaceship = None):
     world.player1 = player1spaceship
 
     player1.take_control(world.player1)
 
-    if hasattr(parent_module, "enemy"):
-        enemy_spaceship = parent_module.enemy
-        world.objects.remove(world.enemy_spaceships[0])
-        world.enemy_spaceships[0] = enemy_spaceship
+    if enemy_spaceship:
+        world.remove_object(world.enemy_spaceships[0])
+        world.replace_enemy_spaceship(world.enemy_spaceships[0], enemy_spaceship) # An enemy registers itself when created
         pilots[0].take_control(enemy_spaceship)
 
     #Enemy UI bars init
@@ -163,19 +257,36 @@ def play():
         Bar((WIDTH-185, HEIGHT - 35),  (180,10),  (99, 88, 26),   (50, 50, 50), reversed = True, source=world.player2, value_attr = "_cooldown_timer_frames", max_value_attr = "_cooldown_frames")
         Bar((WIDTH-185, HEIGHT - 35),  (180,10),  (200, 178, 52), (50, 50, 50), source = world.player2, value_attr = "_ability_timer_frames", max_value_attr = "_ability_duration_frames")
 
+    world.flush()
+
+def play():
+    global replay
+    if headless:
+        return
+
+    player1spaceship = create_player_spaceship(parent_module)
+    start_match(player1spaceship, parent_module.enemy if hasattr(parent_module, "enemy") else None)
+
+    if RECORD_REPLAYS:
+        replay = Recorder(rng.master_seed, player = getattr(parent_module, "__file__", None))
+        atexit.register(replay.save)
+
+    if DIRTY_RECTS:
+        dirty_rects.install()
+
     #Run inspection
-    # if USE_INSPECTOR:
-    #     illegal_code = run_source_code_inspection(str(parent_source))
-    #     inspection_message = ""
-    #     if len(illegal_code) > 0:
-    #         illegal_code = [f"\"{code}\"" for code in illegal_code]
-    #         inspection_message = "Illegal source code: " + str.join(', ', illegal_code)
-    #     inspection_message += run_inspection(player1spaceship_blueprint)
-    #     if len(inspection_message)>0:
-    #         print(inspection_message)
-    #         world.objects = []
-    #         world.guis = []
-    #         Text("WARNING:\n" + inspection_message, (50, HEIGHT//2 - 100), 1200, fontsize=30, color=(200, 50, 50))
-    #         clock.schedule_unique(sys.exit, 20)
-        
+    if USE_INSPECTOR:
+        parent_source = inspect.getsource(parent_module)
+        illegal_code = run_source_code_inspection(str(parent_source))
+        inspection_message = ""
+        if len(illegal_code) > 0:
+            illegal_code = [f"\"{code}\"" for code in illegal_code]
+            inspection_message = "Illegal source code: " + str.join(', ', illegal_code) + "\n"
+        inspection_message += run_inspection(player1spaceship._blueprint)
+        if len(inspection_message)>0:
+            print(inspection_message)
+            world.clear()
+            Text("WARNING:\n" + inspection_message, (50, HEIGHT//2 - 100), 1200, fontsize=30, color=(200, 50, 50))
+            scheduler.schedule_unique(sys.exit, 20)
+
     pgzrun.go()
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import pickle
+import hashlib
+import argparse
+
+import pygame
+from pgzero import loaders
+
+# Decoding the PNG files of the images folder is most of the time the game needs
+# to start. The texture atlas packs all of them into a few large surfaces (pages)
+# and keeps their converted pixels in one cache file, which loads without any
+# decoding. The images are then put in the cache of pgzero's image loader as
+# subsurfaces of the pages, so Actor('spaceships/spaceship_black1') and
+# images.load() find them there and nothing else changes.
+#
+# The cache file belongs to the images it was made from: its key is the hash of
+# the names and the contents of the image files, a new or changed image makes it
+# again on the next start. "python -m library.atlas" makes it in advance.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ATLAS_FILE = os.path.join(ROOT, "cache", "images.atlas")
+FORMAT = 1 # Changes when the layout of the cache file changes
+PAGE_SIZE = 1024 # Larger images get a page of their own
+PADDING = 1
+SKIPPED_FOLDERS = ("templates",) # Images for the students to copy, not used by the game
+PIXELS = "BGRA" # The byte order of the surfaces of convert_alpha() on most computers, converting is then a copy
+
+def images_folder():
+    return os.path.join(loaders.root, loaders.images.subpath)
+
+def sources(folder = None):
+    # Image name (like pgzero's, without the extension) -> path of the file
+    folder = folder or images_folder()
+    extensions = tuple("." + extension for extension in loaders.ImageLoader.EXTNS)
+    found = {}
+    for directory, folders, files in os.walk(folder):
+        folders[:] = sorted([name for name in folders if name not in SKIPPED_FOLDERS])
+        for file in sorted(files):
+            if file.endswith(extensions):
+                path = os.path.join(directory, file)
+                name = os.path.splitext(os.path.relpath(path, folder))[0].replace(os.sep, "/")
+                found.setdefault(name, path)
+    return found
+
+def sources_key(sources):
+    digest = hashlib.sha1(f"{FORMAT} {PAGE_SIZE} {PADDING}".encode())
+    for name, path in sorted(sources.items()):
+        with open(path, "rb") as file:
+            digest.update(name.encode())
+            digest.update(hashlib.sha1(file.read()).digest())
+    return digest.hexdigest()
+
+def pack(sizes, page_size = PAGE_SIZE, padding = PADDING):
+    # Shelf packing, the tallest images first. Returns the place of every image,
+    # name -> (page, x, y), and the sizes of the pages.
+    places = {}
+    pages = []
+    shelved = []
+    for name, (width, height) in sorted(sizes.items(), key = lambda item: (-item[1][1], item[0])):
+        if width > page_size or height > page_size:
+            places[name] = (len(pages), 0, 0)
+            pages.append((width, height))
+        else:
+            shelved.append((name, width, height))
+
+    page = None
+    x = y = shelf = 0
+    for name, width, height in shelved:
+        if x + width > page_size:
+            x, y, shelf = 0, y + shelf + padding, 0
+        if page is None or y + height > page_size:
+            if page is not None:
+                pages[page] = (page_size, page_size)
+            page = len(pages)
+            pages.append(None) # The size of the last page is known at the end
+            x = y = shelf = 0
+        places[name] = (page, x, y)
+        x += width + padding
+        shelf = max(shelf, height)
+    if page is not None:
+        pages[page] = (page_size, y + shelf)
+    return places, pages
+
+class Atlas():
+
+    def __init__(self, key, pages, rects):
+        self.key = key
+        self.pages = pages # Surfaces
+        self.rects = rects # name -> (page, x, y, width, height)
+
+    @classmethod
+    def build(cls, sources, key = None):
+        images = {name: pygame.image.load(path).convert_alpha() for name, path in sources.items()}
+        places, sizes = pack({name: image.get_size() for name, image in images.items()})
+        pages = [pygame.Surface(size, pygame.SRCALPHA) for size in sizes]
+        rects = {}
+        for name, image in images.items():
+            page, x, y = places[name]
+            # The pages are transparent black, taking the maximum copies the pixels without blending
+            pages[page].blit(image, (x, y), special_flags = pygame.BLEND_RGBA_MAX)
+            rects[name] = (page, x, y, *image.get_size())
+        return cls(key or sources_key(sources), [page.convert_alpha() for page in pages], rects)
+
+    def save(self, path = ATLAS_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        state = {"format": FORMAT,
+                 "key": self.key,
+                 "pages": [(page.get_size(), pygame.image.tobytes(page, PIXELS)) for page in self.pages],
+                 "rects": self.rects}
+        with open(path + ".tmp", "wb") as file:
+            pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path) # A game started meanwhile never reads half a file
+
+    @classmethod
+    def load(cls, path = ATLAS_FILE):
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if state.get("format") != FORMAT:
+            return None
+        pages = [pygame.image.frombuffer(pixels, size, PIXELS).convert_alpha() for size, pixels in state["pages"]]
+        return cls(state["key"], pages, state["rects"])
+
+    def image(self, name):
+        page, x, y, width, height = self.rects[name]
+        return self.pages[page].subsurface((x, y, width, height))
+
+    def install(self, loader = loaders.images):
+        # Images that are already loaded keep their surfaces
+        for name in self.rects:
+            loader.cache.setdefault(loader.cache_key(name, (), {}), self.image(name))
+
+    def statistics(self):
+        return {"images": len(self.rects),
+                "pages": len(self.pages),
+                "megabytes": sum([page.get_width()*page.get_height()*4 for page in self.pages])/(1024*1024)}
+
+def load_atlas(path = ATLAS_FILE, folder = None, rebuild = False):
+    # The atlas of the images folder, made again (and saved) when the images changed
+    images = sources(folder)
+    key = sources_key(images)
+    atlas = None
+    if not rebuild and os.path.exists(path):
+        try:
+            atlas = Atlas.load(path)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, pygame.error):
+            atlas = None
+    if atlas is None or atlas.key != key:
+        atlas = Atlas.build(images, key)
+        try:
+            atlas.save(path)
+        except OSError:
+            pass # A read-only folder, the atlas is made again on the next start
+    return atlas
+
+def install_atlas(path = ATLAS_FILE):
+    atlas = load_atlas(path)
+    atlas.install()
+    return atlas
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Pack the images of the game into the texture atlas cache file.")
+    parser.add_argument("--output", default = ATLAS_FILE, help = f"cache file (default {os.path.relpath(ATLAS_FILE, ROOT)})")
+    args = parser.parse_args(argv)
+
+    if not pygame.display.get_init() or pygame.display.get_surface() is None:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.set_mode((1, 1))
+    loaders.set_root(os.path.join(ROOT, "game.py"))
+    start = time.perf_counter()
+    atlas = load_atlas(args.output, rebuild = True)
+    statistics = atlas.statistics()
+    print(f"{statistics['images']} images packed into {statistics['pages']} pages ({statistics['megabytes']:.1f} MB) "
+          f"in {time.perf_counter() - start:.2f} s, saved to {args.output}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import platform
+import argparse
+import subprocess
+from dataclasses import dataclass
+
+# Benchmarks play fixed, seeded scenarios headless and measure how fast the game
+# simulates them: ticks per second, the median and the 99th percentile of the
+# tick time and how the time splits between the phases of a tick. The results
+# are saved as JSON, a run can be compared with the results of an older version.
+
+from library.simulation import Simulation, ROOT
+
+import game
+from library import laboratory
+from library.blueprints import SpaceshipBlueprint, WeaponBlueprint
+from library.spaceship import default_update
+from library.replay import world_checksum
+from library.utils import world
+from library.globals import IMAGES_SPACESHIPS, MIN_COOLDOWN, MIN_ABILITY_DURATION, COLLISION_BACKEND, Type
+
+TICKS = 60*60 # A minute of game time per scenario
+SEED = 1
+RESULTS_FOLDER = os.path.join(ROOT, "benchmarks")
+
+def firing_update(spaceship):
+    # The player's side moves like the enemies, fires all the time and uses its ability as soon as it can
+    default_update(spaceship)
+    spaceship.weapon.shoot()
+    spaceship.activate_ability()
+
+def blueprint(weapon, ability = None, ability_duration = 6, cooldown_duration = 6):
+    # Spaceships that do not die, so every scenario plays all of its ticks
+    return SpaceshipBlueprint(image = IMAGES_SPACESHIPS[0],
+                              health = 1000000,
+                              speed = 4,
+                              ability_duration = ability_duration,
+                              cooldown_duration = cooldown_duration,
+                              ability_function = ability,
+                              update_function = firing_update,
+                              weapon = WeaponBlueprint(weapon.firerate, weapon.barrels, weapon.damage, weapon.speed,
+                                                       weapon.spread_angle, weapon.randomness))
+
+@dataclass
+class Scenario():
+
+    name: str
+    description: str
+    player: SpaceshipBlueprint
+    enemy: SpaceshipBlueprint
+    enemies: int = 1
+    asteroids_per_second: float = None # None keeps the one of the settings
+    objects_limit: int = None # None keeps the limits of the settings
+    asteroids_limit: int = None
+
+    def simulation(self, seed = SEED):
+        simulation = Simulation(self.player, self.enemy, seed, enemies = self.enemies)
+        if self.objects_limit is not None:
+            world.budget.limit = self.objects_limit
+        if self.asteroids_limit is not None:
+            world.budget.quotas[Type.ASTEROID] = self.asteroids_limit
+        return simulation
+
+SCENARIOS = [
+    Scenario("duel", "one enemy, automatic against automatic",
+             blueprint(laboratory.automatic), blueprint(laboratory.automatic)),
+    Scenario("asteroid_storm", "30 asteroids per second, up to 300 at once",
+             blueprint(laboratory.cannon), blueprint(laboratory.cannon), asteroids_per_second = 30,
+             objects_limit = 400, asteroids_limit = 300),
+    Scenario("gatling_vs_shotgun", "gatling gun against shotgun, both firing all the time",
+             blueprint(laboratory.gatling_gun), blueprint(laboratory.shotgun)),
+    Scenario("many_enemies", "eight enemies with weapons and abilities of the laboratory",
+             blueprint(laboratory.trident), blueprint(laboratory.automatic), enemies = 8),
+    Scenario("reflector_spam", "reflectors deployed as often as the cooldown allows, gatling guns",
+             blueprint(laboratory.gatling_gun, laboratory.reflection, MIN_ABILITY_DURATION, MIN_COOLDOWN),
+             blueprint(laboratory.gatling_gun, laboratory.reflection, MIN_ABILITY_DURATION, MIN_COOLDOWN)),
+]
+
+def percentile(values, fraction):
+    # values must be sorted
+    return values[min(len(values) - 1, int(fraction*len(values)))]
+
+def run(scenario, ticks = TICKS, seed = SEED):
+    asteroids_per_second = game.ASTEROIDS_PER_SECOND
+    if scenario.asteroids_per_second is not None:
+        game.ASTEROIDS_PER_SECOND = scenario.asteroids_per_second
+    try:
+        simulation = scenario.simulation(seed)
+        phases = simulation.phases
+        phase_seconds = [0.0]*len(phases)
+        tick_seconds = []
+        objects = 0
+        clock = time.perf_counter
+        for tick in range(ticks):
+            start = last = clock()
+            for i, (name, phase) in enumerate(phases):
+                phase()
+                now = clock()
+                phase_seconds[i] += now - last
+                last = now
+            simulation.tick += 1
+            tick_seconds.append(last - start)
+            objects += len(world.objects)
+    finally:
+        game.ASTEROIDS_PER_SECOND = asteroids_per_second
+
+    seconds = sum(tick_seconds)
+    tick_seconds.sort()
+    return {"description": scenario.description,
+            "ticks": ticks,
+            "seed": seed,
+            "seconds": seconds,
+            "ticks_per_second": ticks/seconds,
+            "p50_ms": percentile(tick_seconds, 0.5)*1000,
+            "p99_ms": percentile(tick_seconds, 0.99)*1000,
+            "max_ms": tick_seconds[-1]*1000,
+            "mean_objects": objects/ticks,
+            "checksum": world_checksum(), # The same for the same game, whatever the speed
+            "phases_ms": {name: phase_seconds[i]*1000/ticks for i, (name, phase) in enumerate(phases)}}
+
+def version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd = ROOT, capture_output = True,
+                              text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_all(scenarios = SCENARIOS, ticks = TICKS, seed = SEED, report = print):
+    results = {"version": version(),
+               "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "python": platform.python_version(),
+               "machine": platform.platform(),
+               "collision_backend": COLLISION_BACKEND,
+               "scenarios": {}}
+    for scenario in scenarios:
+        result = results["scenarios"][scenario.name] = run(scenario, ticks, seed)
+        if report:
+            report(describe(scenario.name, result))
+    return results
+
+def describe(name, result):
+    phases = ", ".join([f"{phase} {ms:.3f}" for phase, ms in result["phases_ms"].items()])
+    return (f"{name:<20} {result['ticks_per_second']:>8.0f} ticks/s  p50 {result['p50_ms']:.3f} ms  "
+            f"p99 {result['p99_ms']:.3f} ms  {result['mean_objects']:.0f} objects\n{'':<20} ms per tick: {phases}")
+
+def compare(old, new):
+    # Lines of the scenarios found in both results, positive changes are faster.
+    # Scenarios whose world checksum changed did not play the same game.
+    lines = [f"{'Scenario':<20} {'Before':>10} {'After':>10} {'Change':>8}  (ticks/s)"]
+    for name, result in new["scenarios"].items():
+        if name not in old["scenarios"]:
+            continue
+        before = old["scenarios"][name]["ticks_per_second"]
+        after = result["ticks_per_second"]
+        line = f"{name:<20} {before:>10.0f} {after:>10.0f} {after/before - 1:>+8.1%}"
+        same_run = all([old["scenarios"][name].get(key) == result[key] for key in ("ticks", "seed")])
+        if same_run and old["scenarios"][name].get("checksum") not in (None, result["checksum"]):
+            line += "  the game played differently"
+        lines.append(line)
+    return "\n".join(lines)
+
+def main(argv = None):
+    names = [scenario.name for scenario in SCENARIOS]
+    parser = argparse.ArgumentParser(description = "Measure how fast the game simulates a set of scenarios.")
+    parser.add_argument("scenarios", nargs = "*", help = f"scenarios to run (default: all of {', '.join(names)})")
+    parser.add_argument("--ticks", type = int, default = TICKS, help = f"ticks per scenario (default {TICKS})")
+    parser.add_argument("--seed", type = int, default = SEED, help = f"seed of the scenarios (default {SEED})")
+    parser.add_argument("--output", help = "JSON file for the results (default: a new file in the benchmarks folder)")
+    parser.add_argument("--compare", help = "JSON file of earlier results to compare with")
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in names:
+            parser.error(f"unknown scenario {name}, choose from {', '.join(names)}")
+
+    scenarios = [scenario for scenario in SCENARIOS if not args.scenarios or scenario.name in args.scenarios]
+    results = run_all(scenarios, args.ticks, args.seed)
+
+    path = args.output
+    if path is None:
+        os.makedirs(RESULTS_FOLDER, exist_ok = True)
+        path = os.path.join(RESULTS_FOLDER, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['version'] or 'unknown'}.json")
+    with open(path, "w", encoding = "utf-8") as file:
+        json.dump(results, file, indent = 2)
+    print(f"Results saved to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding = "utf-8") as file:
+            print()
+            print(compare(json.load(file), results))
+
+if __name__ == "__main__":
+    main()
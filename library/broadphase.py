@@ -0,0 +1,159 @@
+from library.globals import COLLISION_BACKEND, COLLISION_CELL_SIZE
+
+# The broad-phase keeps track of where the collidable objects are and hands
+# update_objects() only the objects that may touch each other (candidates).
+# The exact rect test (narrow-phase) is then done by overlaps().
+#
+# Every backend has the same methods:
+#   update(objects)   called once per frame with all the collidable objects
+#   candidates(obj)   the objects that may collide with obj (obj excluded)
+#   clear()           forgets every object, for a new match
+# Dictionaries are used as ordered sets so the results never depend on object ids.
+
+def overlaps(a, b):
+    # Same test as Actor.colliderect but without building a new rect every call
+    ra = a._rect
+    rb = b._rect
+    return ra.x < rb.x + rb.w and ra.y < rb.y + rb.h and ra.x + ra.w > rb.x and ra.y + ra.h > rb.y
+
+class BruteForce():
+
+    def __init__(self):
+        self._objects = []
+
+    def update(self, objects):
+        self._objects = objects
+
+    def clear(self):
+        self._objects = []
+
+    def candidates(self, obj):
+        return [o for o in self._objects if o is not obj]
+
+class SpatialHashGrid():
+
+    def __init__(self, cell_size = COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}  # (column, row) -> {obj: None}
+        self._spans = {}  # obj -> (first column, first row, last column, last row)
+
+    def _span(self, obj):
+        rect = obj._rect
+        size = self.cell_size
+        return (int(rect.x//size), int(rect.y//size), int((rect.x + rect.w)//size), int((rect.y + rect.h)//size))
+
+    def _insert(self, obj, span):
+        cells = self._cells
+        for column in range(span[0], span[2] + 1):
+            for row in range(span[1], span[3] + 1):
+                cell = cells.get((column, row))
+                if cell is None:
+                    cell = cells[(column, row)] = {}
+                cell[obj] = None
+
+    def _remove(self, obj, span):
+        cells = self._cells
+        for column in range(span[0], span[2] + 1):
+            for row in range(span[1], span[3] + 1):
+                cell = cells[(column, row)]
+                del cell[obj]
+                if not cell:
+                    del cells[(column, row)]
+
+    def clear(self):
+        self._cells = {}
+        self._spans = {}
+
+    def update(self, objects):
+        spans = self._spans
+        current = {}
+        for obj in objects:
+            current[obj] = None
+            span = self._span(obj)
+            old_span = spans.get(obj)
+            # Only objects that crossed a cell border are moved inside the grid
+            if old_span != span:
+                if old_span is not None:
+                    self._remove(obj, old_span)
+                self._insert(obj, span)
+                spans[obj] = span
+
+        for obj in [o for o in spans if o not in current]:
+            self._remove(obj, spans.pop(obj))
+
+    def candidates(self, obj):
+        span = self._spans.get(obj)
+        if span is None:
+            return []
+        cells = self._cells
+        if span[0] == span[2] and span[1] == span[3]:
+            found = dict(cells[(span[0], span[1])])
+        else:
+            found = {}
+            for column in range(span[0], span[2] + 1):
+                for row in range(span[1], span[3] + 1):
+                    found.update(cells[(column, row)])
+        found.pop(obj, None)
+        return list(found)
+
+class SweepAndPrune():
+
+    def __init__(self):
+        self._order = [] # Objects sorted by the left side of their rect, kept between frames
+        self._neighbours = {}
+
+    def clear(self):
+        self._order = []
+        self._neighbours = {}
+
+    def update(self, objects):
+        current = dict.fromkeys(objects)
+        order = [o for o in self._order if o in current]
+        known = dict.fromkeys(order)
+        order.extend([o for o in objects if o not in known])
+
+        # Objects move a little every frame so the previous order is almost sorted
+        # and an insertion sort finishes in close to linear time
+        lefts = [o._rect.x for o in order]
+        for i in range(1, len(order)):
+            obj = order[i]
+            left = lefts[i]
+            j = i - 1
+            while j >= 0 and lefts[j] > left:
+                order[j + 1] = order[j]
+                lefts[j + 1] = lefts[j]
+                j -= 1
+            order[j + 1] = obj
+            lefts[j + 1] = left
+        self._order = order
+
+        neighbours = {o: [] for o in order}
+        active = []
+        for obj in order:
+            rect = obj._rect
+            left = rect.x
+            top = rect.y
+            bottom = rect.y + rect.h
+            active = [o for o in active if o._rect.x + o._rect.w > left]
+            for other in active:
+                other_rect = other._rect
+                if other_rect.y < bottom and other_rect.y + other_rect.h > top:
+                    neighbours[obj].append(other)
+                    neighbours[other].append(obj)
+            active.append(obj)
+        self._neighbours = neighbours
+
+    def candidates(self, obj):
+        return self._neighbours.get(obj, [])
+
+def create_broadphase(backend = COLLISION_BACKEND):
+    if backend == "grid":
+        return SpatialHashGrid()
+    elif backend == "sweep":
+        return SweepAndPrune()
+    elif backend == "none":
+        return BruteForce()
+    else:
+        raise ValueError("collision_backend must be 'grid', 'sweep' or 'none'")
+
+broadphase = create_broadphase()
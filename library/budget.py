@@ -0,0 +1,84 @@
+from operator import attrgetter
+
+from library.globals import OBJECTS_LIMIT, PROJECTILES_LIMIT, ASTEROIDS_LIMIT, POWERUPS_LIMIT, Type
+
+# The budget decides if a new object may be created when the game is crowded.
+# Objects are asked for before they are created (see admit()), so nothing is
+# dropped after the fact. When there is no room:
+#   - spaceships are always admitted and never removed
+#   - a new projectile removes the oldest asteroid, or else the oldest projectile
+#   - asteroids and powerups are simply not created
+# Objects with a lower priority are removed first, the oldest of them first.
+# The objects are counted by the index of the world (World.count()), a removed
+# object leaves the index at once and the world at the next flush.
+
+PRIORITIES = {
+    Type.ASTEROID : 0,
+    Type.PROJECTILE : 1,
+    Type.POWERUP : 2,
+    Type.REFLECTOR : 3,
+}
+RECYCLED_TYPES = [Type.PROJECTILE, Type.REFLECTOR] # Types that make room instead of being refused
+
+class Budget():
+
+    def __init__(self, world, limit = OBJECTS_LIMIT, quotas = None):
+        self.world = world
+        self.limit = limit
+        self.quotas = quotas if quotas is not None else {Type.PROJECTILE : PROJECTILES_LIMIT,
+                                                         Type.ASTEROID : ASTEROIDS_LIMIT,
+                                                         Type.POWERUP : POWERUPS_LIMIT}
+        self.total = 0
+        self.refused = 0
+        self.evicted = 0
+
+    def count(self, type):
+        return self.world.count(type = type)
+
+    def track(self, obj):
+        self.total += 1
+
+    def forget(self, obj):
+        if obj._index_key is None:
+            return # Already evicted
+        self.total -= 1
+
+    def _evict(self, type):
+        # False if there is no object of this type to remove (for example with a quota of 0)
+        if not self.count(type):
+            return False
+        obj = min(self.world.find(type = type), key = attrgetter("_handle")) # Handles grow, the oldest has the smallest
+        self.world.unindex(obj)
+        self.total -= 1
+        self.evicted += 1
+        obj.kill()
+        return True
+
+    def _evict_lowest(self, max_priority):
+        for type in sorted(PRIORITIES, key = PRIORITIES.get):
+            if PRIORITIES[type] > max_priority:
+                return False
+            if self._evict(type):
+                return True
+        return False
+
+    def admit(self, type):
+        # True if an object of this type can be created now, room is made if needed
+        if type not in PRIORITIES:
+            return True
+
+        if type in self.quotas and self.count(type) >= self.quotas[type]:
+            if type not in RECYCLED_TYPES or not self._evict(type):
+                self.refused += 1
+                return False
+
+        if self.total >= self.limit:
+            if type not in RECYCLED_TYPES or not self._evict_lowest(PRIORITIES[type]):
+                self.refused += 1
+                return False
+        return True
+
+    def enforce(self):
+        # Objects created without asking (for example by abilities) can exceed the limit
+        while self.total > self.limit and self._evict_lowest(max(PRIORITIES.values())):
+            pass
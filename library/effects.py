@@ -1,9 +1,11 @@
 import math
 
 from pgzero.actor import Actor
+from pgzero import loaders
 
 from library.utils import world
-from library.globals import EXPLOSION_FRAMES, FPS
+from library.pool import Pool
+from library.globals import EXPLOSION_FRAMES, FPS, EFFECT_POOL_SIZE
 
 class Effect(Actor):
 
@@ -19,7 +21,12 @@ class Effect(Actor):
             self.next_frame = frames[1]
         else:
             self.next_frame = None
-        super().__init__("effects/explosion1",  pos)
+        if "_rect" in self.__dict__:
+            # Recycled by the effect_pool, only the first frame and the position are restored
+            self.image = "effects/explosion1"
+            self.pos = pos
+        else:
+            super().__init__("effects/explosion1",  pos)
         world.add_effect(self)
 
     @property
@@ -39,6 +46,10 @@ class Effect(Actor):
         self.x = x
         self.y = y
 
+    def _on_remove(self):
+        # Called when the effect leaves the world
+        effect_pool.release(self)
+
     def update(self):
         
         self.move_to(*self.next_pos())
@@ -49,7 +60,7 @@ class Effect(Actor):
                 self._index_counter += 1
                 self.current_frame = self.next_frame
 
-                self._orig_surf = self._surf = self.current_frame["image"]
+                self._orig_surf = self._surf = loaders.images.load(self.current_frame["image"])
                 self._update_pos()
 
                 if self._index_counter < len(self.frames):
@@ -59,7 +70,9 @@ class Effect(Actor):
 
         self._frames_counter += 1
 
+effect_pool = Pool("effects", Effect, EFFECT_POOL_SIZE)
+
 def explosion(pos):
     duration = 15
 
-    Effect(frames=EXPLOSION_FRAMES, pos=pos, frames_duration=duration)
\ No newline at end of file
+    effect_pool.acquire(frames=EXPLOSION_FRAMES, pos=pos, frames_duration=duration)
\ No newline at end of file
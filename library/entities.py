@@ -0,0 +1,205 @@
+import math
+import numpy
+
+from library.utils import Object
+from library.globals import HEIGHT, FPS
+
+# Projectiles and asteroids only fly in a straight line until they hit something,
+# leave the screen or their timespan ends. Instead of moving them one at a time
+# their state lives in the columns of an EntityStore and all of them are moved,
+# culled and aged with a few numpy operations per frame.
+# The Projectile and Asteroid objects stay the way to access them (for collisions,
+# drawing and abilities); their properties read and write the columns.
+
+class EntityStore():
+
+    def __init__(self, y_min, y_max, capacity = 256):
+        self.y_min = y_min # Entities die when they reach y_min or y_max
+        self.y_max = y_max
+        self.count = 0
+        self.objects = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = self.__dict__.get("x")
+        columns = {
+            "x" : numpy.zeros(capacity),
+            "y" : numpy.zeros(capacity),
+            "vx" : numpy.zeros(capacity),
+            "vy" : numpy.zeros(capacity),
+            "health" : numpy.zeros(capacity),
+            "team" : numpy.zeros(capacity, dtype=numpy.int8),
+            "lifetime" : numpy.zeros(capacity, dtype=numpy.int64), # Frames left to live, -1 lives forever
+            "alive" : numpy.zeros(capacity, dtype=bool),
+        }
+        if old is not None:
+            for name, column in columns.items():
+                column[:self.count] = getattr(self, name)[:self.count]
+        self.__dict__.update(columns)
+        self.capacity = capacity
+
+    def add(self, obj):
+        if self.count == self.capacity:
+            self._allocate(self.capacity*2)
+        slot = self.count
+        self.count += 1
+        self.objects.append(obj)
+        self.x[slot], self.y[slot] = obj.pos
+        self.vx[slot], self.vy[slot] = obj.velocity()
+        self.health[slot] = obj.health
+        self.team[slot] = obj.team
+        self.lifetime[slot] = round(obj.timespan*FPS) if obj.timespan > 0 else -1
+        self.alive[slot] = obj.alive
+        return slot
+
+    def remove(self, slot):
+        # Swap with the last entity so the columns stay packed
+        last = self.count - 1
+        obj = self.objects[slot]
+        if slot != last:
+            moved = self.objects[last]
+            self.objects[slot] = moved
+            moved._slot = slot
+            for column in (self.x, self.y, self.vx, self.vy, self.health, self.team, self.lifetime, self.alive):
+                column[slot] = column[last]
+        self.objects.pop()
+        self.count = last
+        obj._slot = None
+
+    def clear(self):
+        for obj in self.objects:
+            obj._slot = None
+        self.objects = []
+        self.count = 0
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        x += self.vx[:n]
+        y += self.vy[:n]
+
+        # Dead entities keep moving until update_objects() removes them from the world
+        lifetime = self.lifetime[:n]
+        lifetime[lifetime > 0] -= 1
+
+        alive = self.alive[:n]
+        expired = alive & ((y <= self.y_min) | (y >= self.y_max) | (lifetime == 0))
+        destroyed = self.health[:n] <= 0
+
+        objects = self.objects
+        for obj, px, py in zip(objects, x.tolist(), y.tolist()):
+            rect = obj._rect
+            anchor = obj._anchor
+            rect.x = px - anchor[0]
+            rect.y = py - anchor[1]
+
+        for slot in numpy.flatnonzero(expired | destroyed).tolist():
+            objects[slot].alive = False
+        for slot in numpy.flatnonzero(destroyed).tolist():
+            objects[slot].destroyed()
+
+# The attributes of the rect that move the Actor
+RECT_POSITIONS = frozenset(["left", "right", "top", "bottom", "centerx", "centery", "topleft", "topright", "bottomleft",
+                            "bottomright", "midtop", "midbottom", "midleft", "midright", "center"])
+
+class StoredObject(Object):
+
+    store = None # The EntityStore of the subclass
+    _slot = None
+
+    def __init__(self, image, pos, timespan = -1, dummy = False, **kwargs):
+        # The store counts the timespan down, no scheduler timer is needed
+        super().__init__(image, pos, timespan = -1, dummy = dummy, **kwargs)
+        self.timespan = timespan
+        if not dummy:
+            self._slot = self.store.add(self)
+
+    def velocity(self):
+        return (self.speed*math.cos(self._radians), self.speed*math.sin(self._radians))
+
+    def _update_velocity(self):
+        if self._slot is not None:
+            self.store.vx[self._slot], self.store.vy[self._slot] = self.velocity()
+
+    def __setattr__(self, attr, value):
+        # pos, x and y of the Actor set the rect too, so every way of moving the entity ends up here.
+        # The methods of the rect that move it in place (move_ip(), clamp_ip()) are not seen, use pos instead
+        super().__setattr__(attr, value)
+        if attr in RECT_POSITIONS and self._slot is not None:
+            self.store.x[self._slot], self.store.y[self._slot] = self.pos
+
+    @property
+    def direction(self):
+        return self._direction
+
+    @direction.setter
+    def direction(self, value):
+        Object.direction.fset(self, value)
+        self._update_velocity()
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @speed.setter
+    def speed(self, value):
+        self._speed = value
+        self._update_velocity()
+
+    @property
+    def health(self):
+        return self._health
+
+    @health.setter
+    def health(self, value):
+        Object.health.fset(self, value)
+        if self._slot is not None:
+            self.store.health[self._slot] = self._health
+
+    @property
+    def team(self):
+        return self._team
+
+    @team.setter
+    def team(self, value):
+        Object.team.fset(self, value)
+        if self._slot is not None:
+            self.store.team[self._slot] = value
+
+    @property
+    def alive(self):
+        return self._alive
+
+    @alive.setter
+    def alive(self, value):
+        self._alive = value
+        if self._slot is not None:
+            self.store.alive[self._slot] = value
+
+    def update(self):
+        # Only entities outside of a store (dummies) move by themselves
+        if self._slot is None:
+            self.move_to_next_pos()
+
+    def _on_remove(self):
+        if self._slot is not None:
+            self.store.remove(self._slot)
+
+    def destroyed(self):
+        # Called by the store when the health of the entity reaches 0
+        pass
+
+projectile_store = EntityStore(y_min = -10, y_max = HEIGHT + 10)
+asteroid_store = EntityStore(y_min = -50, y_max = HEIGHT + 50)
+stores = [projectile_store, asteroid_store]
+
+def update_stores():
+    for store in stores:
+        store.update()
+
+def clear_stores():
+    for store in stores:
+        store.clear()
@@ -1,13 +1,10 @@
 from enum import IntEnum
 
 from pgzero.actor import Actor
-from pgzero import loaders
 import pygame
 
 from library import settings
 
-desktop_sizes = pygame.display.get_desktop_sizes()
-
 # Some variables such as WIDTH, HEIGHT can be changed from library -> settings.py
 
 # Display constants
@@ -17,21 +14,47 @@ FULLSCREEN = settings.fullscreen
 FPS = 60
 
 if FULLSCREEN:
-    WIDTH, HEIGHT = desktop_sizes[0]
+    WIDTH, HEIGHT = pygame.display.get_desktop_sizes()[0]
     pygame.display.set_mode((WIDTH, HEIGHT), pygame.FULLSCREEN)
 
 # Game constants
 OBJECTS_LIMIT = settings.objects_limit 
+PROJECTILES_LIMIT = settings.projectiles_limit
+ASTEROIDS_LIMIT = settings.asteroids_limit
+POWERUPS_LIMIT = settings.powerups_limit
 TUTORIAL = settings.show_controls 
 TUTORIAL_MESSAGE = "Controls:\nLEFT and RIGHT arrows to move\nSPACE to shoot\nLEFT SHIFT to activate ability\nESC to quit"
 TUTORIAL_MESSAGE_P2 = "Player 2 controls:\nKEYPAD 6 for to move right\nKEYPAD 4 to move left\nKEYPAD 0 to shoot\nKEYPAD ENTER to activate ability\nESC to quit"
 MAX_SPACESHIP_POINTS = 200
-USE_INSPECTOR = False #Broken
+USE_INSPECTOR = False #Checks the spaceship of the participant before the match
 MAX_ABILITY_MSG_LENGTH = 30
+TEXTURE_ATLAS = settings.texture_atlas
+if TEXTURE_ATLAS: # Before the first image is loaded
+    from library.atlas import install_atlas
+    install_atlas()
 WIN_GRAPHIC = Actor('others/win', (WIDTH//2, HEIGHT//2))
 LOSE_GRAPHIC = Actor('others/lose', (WIDTH//2, HEIGHT//2))
 NUMBER_OF_PLAYERS = 2 if settings.two_players else 1  
 NUMBER_OF_ENEMIES = settings.number_of_enemies  
+SEED = settings.seed
+RECORD_REPLAYS = settings.record_replays
+
+# Performance constants
+COLLISION_BACKEND = settings.collision_backend
+COLLISION_CELL_SIZE = settings.collision_cell_size
+PROJECTILE_POOL_SIZE = settings.projectile_pool_size
+EFFECT_POOL_SIZE = settings.effect_pool_size
+ASTEROID_POOL_SIZE = settings.asteroid_pool_size
+ROTATION_STEP = settings.rotation_step
+ROTATION_CACHE_SIZE = settings.rotation_cache_size
+BATCH_HUD_BARS = settings.batch_hud_bars
+BATCH_SPRITES = settings.batch_sprites
+DIRTY_RECTS = settings.dirty_rects
+TEXT_CACHE_SIZE = settings.text_cache_size
+BATCH_PILOTS = settings.batch_pilots
+PILOT_DECISION_TICKS = settings.pilot_decision_ticks
+PROFILER = settings.profiler
+PROFILER_FRAMES = settings.profiler_frames
 
 # Enviroment constants
 ASTEROIDS_SPEED = settings.asteroids_speed 
@@ -155,9 +178,9 @@ IMAGES_ASTEROIDS = [
 ]
 
 EXPLOSION_FRAMES = [
-        {"frame_number" : 0, "image" : loaders.images.load("effects/explosion1")},
-        {"frame_number" : 3, "image" : loaders.images.load("effects/explosion2")},
-        {"frame_number" : 5, "image" : loaders.images.load("effects/explosion3")},
-        {"frame_number" : 8, "image" : loaders.images.load("effects/explosion4")},
-        {"frame_number" : 10, "image" : loaders.images.load("effects/explosion5")}
+        {"frame_number" : 0, "image" : "effects/explosion1"},
+        {"frame_number" : 3, "image" : "effects/explosion2"},
+        {"frame_number" : 5, "image" : "effects/explosion3"},
+        {"frame_number" : 8, "image" : "effects/explosion4"},
+        {"frame_number" : 10, "image" : "effects/explosion5"}
 ]
\ No newline at end of file
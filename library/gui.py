@@ -1,24 +1,48 @@
 import math
+from collections import OrderedDict
 
 from pygame import draw, Surface, Rect, Color
 from pgzero import game, ptext
 
-from library.globals import WIDTH, HEIGHT, FPS, Team
+from library.globals import WIDTH, HEIGHT, FPS, Team, BATCH_HUD_BARS, TEXT_CACHE_SIZE
 from library.utils import world, clamp_value
 
-class Bar():
+class BarStrip():
+    # Every fill width of one kind of bar (size and colors) in one surface, a row per
+    # width. Bars of the same kind share it and a row is drawn the first time it is used,
+    # the surface of a bar is the row of its current width.
+
+    def __init__(self, size, color_front, color_back):
+        self.size = size
+        self.color_front = color_front
+        self.color_back = color_back
+        self.surface = Surface((size[0], size[1]*(size[0] + 1)))
+        self._rendered = set()
+
+    def area(self, width):
+        if width not in self._rendered:
+            y = width*self.size[1]
+            draw.rect(self.surface, self.color_back, Rect(0, y, self.size[0], self.size[1]), border_radius = 4)
+            draw.rect(self.surface, self.color_front, Rect(0, y, width, self.size[1]), border_radius = 4)
+            self._rendered.add(width)
+        return Rect(0, width*self.size[1], self.size[0], self.size[1])
 
-    def generate_surface(self, size: tuple, color_front: Color) -> Surface:
-        surface = Surface(size=size)
-        rect_front = Rect(0, 0, size[0], size[1])
-        draw.rect(surface, color_front, rect_front, border_radius = 4)
-        return surface
+_bar_strips = {}
+
+def bar_strip(size, color_front, color_back):
+    key = (size, tuple(color_front), tuple(color_back))
+    strip = _bar_strips.get(key)
+    if strip is None:
+        strip = _bar_strips[key] = BarStrip(size, color_front, color_back)
+    return strip
+
+class Bar():
+    # The surface of a bar is only made again when the width of its fill changes by a pixel
 
     def __init__(self, pos, size, color_front, color_back, max_value = 1, visible = True, reversed = False, source = None, attached = False, value_attr = None, max_value_attr = None):
         self.visible = visible
         self.pos = pos
-        self.size = size
-        self.surface = self.generate_surface(size, color_front)
+        self.size = (int(size[0]), int(size[1]))
         self.color_front = Color(color_front)
         self.color_back = Color(color_back)
         self._value = 1
@@ -33,18 +57,17 @@ class Bar():
             self.x_offset = pos[0]
             self.y_offset = pos[1]
         self.reversed = reversed
+        self.update_surface()
         world.add_gui(self)
 
+    def _fill_width(self):
+        percentage = 1 - self._percentage if self.reversed else self._percentage
+        return int(clamp_value(percentage*self.size[0], 0, self.size[0]))
+
     def update_surface(self) -> Surface:
-        self.surface = Surface(self.size)
-        if self.reversed:
-            width_front = (1 - (self._percentage))*self.size[0]
-        else:
-            width_front = (self._percentage)*self.size[0]
-        rect_back= Rect(0, 0, self.size[0], self.size[1])
-        rect_front = Rect(0, 0, width_front, self.size[1])
-        draw.rect(self.surface, self.color_back, rect_back, border_radius = 4)
-        draw.rect(self.surface, self.color_front, rect_front, border_radius = 4)
+        self._width = self._fill_width()
+        strip = bar_strip(self.size, self.color_front, self.color_back)
+        self.surface = strip.surface.subsurface(strip.area(self._width))
 
     def update(self, value = None, max_value = None):
         if self._percentage > 0:
@@ -64,12 +87,24 @@ class Bar():
         if self.attached and self.source:
             self.pos = ((self.source.pos[0] - self.size[0]//2 + self.x_offset), (self.source.pos[1] - self.size[1]//2 + self.y_offset))
          
-        self.update_surface()
+        if self._fill_width() != self._width:
+            self.update_surface()
 
     def draw(self):
         if self.visible and self.source and self.source.alive:
             game.screen.blit(self.surface, self.pos)
 
+    def queue(self, blits):
+        # Like draw(), adds the blit to a batch for draw_guis() instead
+        if self.visible and self.source and self.source.alive:
+            blits.append((self.surface, self.pos))
+
+    def screen_rect(self):
+        # For library.render, a pixel larger on every side like the rects of the actors
+        if self.visible and self.source and self.source.alive:
+            return Rect(int(self.pos[0]) - 1, int(self.pos[1]) - 1, self.size[0] + 2, self.size[1] + 2)
+        return None
+
     @property
     def value(self):
         return self._value
@@ -94,6 +129,68 @@ class Bar():
         else:
             self._percentage = self._value/self._max_value
 
+def queue_guis(guis, blits, batch = BATCH_HUD_BARS):
+    # Adds the bars to blits, the other guis are drawn at once after the blits queued before them
+    for gui in guis:
+        if batch and isinstance(gui, Bar):
+            gui.queue(blits)
+            continue
+        if blits:
+            game.screen.blits(blits, doreturn = False)
+            blits.clear()
+        gui.draw()
+
+def draw_guis(guis, batch = BATCH_HUD_BARS):
+    # Bars next to each other in the list are drawn with one blits() call
+    blits = []
+    queue_guis(guis, blits, batch)
+    if blits:
+        game.screen.blits(blits, doreturn = False)
+
+class RenderedText():
+    # A message rendered once by ptext. The beginning of it (typing) is shown by
+    # clipping the lines of the surface and fading is the alpha of the surface.
+
+    def __init__(self, text, fontname, fontsize, color):
+        # A copy, ptext can return the surface of its own cache and the alpha of this one changes
+        self.surface = ptext.getsurf(text, fontname = fontname, fontsize = fontsize, color = color, cache = False).copy()
+        self.font = ptext.getfont(fontname, fontsize)
+        self.fontname = fontname
+        self.fontsize = fontsize
+
+    def areas(self, text):
+        # The parts of the surface showing text, the beginning of the message. ptext lays
+        # out the lines of any text the same way, so they are the lines ptext would render.
+        linesize = self.font.get_linesize()*ptext.DEFAULT_LINE_HEIGHT
+        height = self.font.get_height()
+        return [Rect(0, int(round(k*linesize)), self.font.size(line)[0], height)
+                for k, line in enumerate(ptext.wrap(text, self.fontname, self.fontsize))]
+
+class TextCache():
+    # The least recently used messages are dropped when more than size are kept
+
+    def __init__(self, size = TEXT_CACHE_SIZE):
+        self.size = size
+        self._texts = OrderedDict() # (text, fontname, fontsize, color) -> RenderedText
+        self.renders = 0
+
+    def get(self, text, fontname, fontsize, color):
+        key = (text, fontname, fontsize, tuple(color))
+        rendered = self._texts.get(key)
+        if rendered is not None:
+            self._texts.move_to_end(key)
+            return rendered
+        self.renders += 1
+        rendered = self._texts[key] = RenderedText(text, fontname, fontsize, color)
+        while len(self._texts) > self.size:
+            self._texts.popitem(last = False)
+        return rendered
+
+    def clear(self):
+        self._texts.clear()
+
+text_cache = TextCache()
+
 class Text():
 
     def __init__(self, text, pos, frames_duration = FPS, fontname='future', fontsize = 32, speed=0, direction=0, color = (255,255,255), alpha = 1.0, fade = False, typing= False):
@@ -112,6 +209,8 @@ class Text():
         self.typing = typing
         self._fade_step = alpha/frames_duration
         self._typing_letter_frames = 4
+        self._areas = None # The clipped lines of the message while typing
+        self._shown = None # The text of _areas
         world.add_gui(self)
 
     @property
@@ -153,8 +252,32 @@ class Text():
             self.content = self._initial_content[0:text_length]
         self._frames_counter += 1
 
+    def _rendered(self):
+        # The rendered message and if only the beginning of it is typed yet
+        typed = self.typing and self.content != self._initial_content
+        return text_cache.get(self._initial_content if typed else self.content, self.fontname, self.fontsize, self.color), typed
+
+    def screen_rect(self):
+        # For library.render, the whole message even while it is typed
+        if not self.content or self.alpha <= 0:
+            return None
+        rendered, typed = self._rendered()
+        return Rect((int(round(self.x)), int(round(self.y))), rendered.surface.get_size())
+
     def draw(self):
-        ptext.draw( surf=game.screen, text=self.content, pos=self.pos, fontname=self.fontname, fontsize=self.fontsize, color=self.color, alpha = self.alpha)
+        alpha = int(round(clamp_value(self.alpha, 0, 1)*255))
+        if not self.content or alpha == 0:
+            return
+        pos = (int(round(self.x)), int(round(self.y)))
+        rendered, typed = self._rendered()
+        rendered.surface.set_alpha(alpha) # Shared by the texts of the same message, set before every draw
+        if not typed:
+            game.screen.blit(rendered.surface, pos)
+            return
+        if self._shown != self.content:
+            self._areas = rendered.areas(self.content)
+            self._shown = self.content
+        game.screen.blits([(rendered.surface, (pos[0], pos[1] + area.y), area) for area in self._areas], doreturn = False)
 
 # healthbar       = Bar((5,HEIGHT - 20),  (180,10),  (113, 172, 57), (50, 50, 50))
 # cooldownbar     = Bar((5,HEIGHT - 35),  (180,10),  (99, 88, 26),   (50, 50, 50), reversed = True)
@@ -1,16 +1,34 @@
 from inspect import signature
+import math
 import re
 
 from library.spaceship import Spaceship
 from library.weapon import Weapon
+from library.blueprints import SpaceshipBlueprint
+from library.utils import clamp_value
 from library.globals import MAX_SPACESHIP_POINTS, MAX_HEALTH_WEIGHT, HEALTH_WEIGHT, SPEED_WEIGHT, ABILITY_DURATION_WEIGHT, COOLDOWN_WEIGHT, COLLIDABLE_WEIGHT, SPACESHIP_CHILDS_LENGTH_WEIGHT
+from library.globals import MIN_COOLDOWN, MAX_COOLDOWN, MIN_ABILITY_DURATION, MAX_ABILITY_DURATION, IMAGES_SPACESHIPS, Team
+from library.globals import MIN_WEAPON_FIRERATE, MAX_WEAPON_FIRERATE, MIN_WEAPON_BARRELS, MAX_WEAPON_BARRELS, MIN_WEAPON_SPREAD_ANGLE, MAX_WEAPON_SPREAD_ANGLE, MIN_WEAPON_RANDOMNESS, MAX_WEAPON_RANDOMNESS
+
+# The inspector scores spaceship blueprints and checks that the update function
+# of a participant does not change what the spaceship can do. The numbers of a
+# blueprint are scored on WeaponStats and SpaceshipStats, which keep the values
+# the points are made of (clamped like the real Weapon and Spaceship). Abilities
+# and update functions run on a dummy Spaceship, the same object they get in a
+# match. Their results only depend on the function, so they are kept by its code
+# and the values it refers to, and a catalog of blueprints sharing a few
+# abilities is scored at thousands per second.
+#
+# Some abilities create objects in the world (fanfire deploys mines), a function
+# is run the first time with a snapshot of the world taken before and put back
+# after it, so inspecting never changes the match.
 
 class DummyControl():
 
     def __init__(self, name, puppet = None):
         self.name = name
         self.puppet = puppet
-        
+
         self.right = False
         self.left = False
         self.ability_key = False
@@ -20,133 +38,240 @@ class DummyControl():
         self.puppet = puppet
         puppet._control = self
 
-dummyControl = DummyControl("Dummy")
-dummyWeaponBlueprint = Weapon( 3, 1, 2, 6 )
-dummySpaceship = Spaceship(
-    health=50,
-    speed=5,
-    cooldown_duration=6,
-    ability_duration=6,
-    weapon=dummyWeaponBlueprint
-)
+class WeaponStats():
+
+    def __init__(self, firerate, barrels, damage, speed, spread_angle = 0, randomness = 0):
+        self.firerate = firerate
+        self.barrels = barrels
+        self.damage = damage
+        self.speed = speed
+        self.spread_angle = spread_angle
+        self.randomness = randomness
+
+    @property
+    def firerate(self):
+        return self._firerate
+
+    @firerate.setter
+    def firerate(self, value):
+        self._firerate = clamp_value(value, MIN_WEAPON_FIRERATE, MAX_WEAPON_FIRERATE)
+
+    @property
+    def barrels(self):
+        return self._barrels
+
+    @barrels.setter
+    def barrels(self, value):
+        self._barrels = clamp_value(value, MIN_WEAPON_BARRELS, MAX_WEAPON_BARRELS)
+
+    @property
+    def spread_angle(self):
+        return self._spread_angle
+
+    @spread_angle.setter
+    def spread_angle(self, value):
+        self._spread_angle = clamp_value(value, MIN_WEAPON_SPREAD_ANGLE, MAX_WEAPON_SPREAD_ANGLE)
+
+    @property
+    def randomness(self):
+        return self._randomness
+
+    @randomness.setter
+    def randomness(self, value):
+        self._randomness = clamp_value(value, MIN_WEAPON_RANDOMNESS, MAX_WEAPON_RANDOMNESS)
+
+class SpaceshipStats():
+    # The numbers of a blueprint, nothing runs on it
+
+    def __init__(self, health, speed, ability_duration, cooldown, weapon = None):
+        self.max_health = health
+        self.health = health
+        self.speed = speed
+        self.ability_duration = ability_duration
+        self.cooldown = cooldown
+        self.weapon = weapon
+        self.collidable = True
+        self.childs = []
+
+    @classmethod
+    def from_blueprint(cls, blueprint: SpaceshipBlueprint):
+        weapon = blueprint.weapon
+        weapon = WeaponStats(weapon.firerate, weapon.barrels, weapon.damage, weapon.speed, weapon.spread_angle, weapon.randomness) if weapon else None
+        return cls(blueprint.health, blueprint.speed, blueprint.ability_duration, blueprint.cooldown_duration, weapon)
+
+    @property
+    def health(self):
+        return self._health
+
+    @health.setter
+    def health(self, value):
+        self._health = clamp_value(value, 0, self.max_health)
+
+    @property
+    def ability_duration(self):
+        return self._ability_duration
+
+    @ability_duration.setter
+    def ability_duration(self, value):
+        self._ability_duration = clamp_value(value, MIN_ABILITY_DURATION, MAX_ABILITY_DURATION)
+
+    @property
+    def cooldown(self):
+        return self._cooldown
+
+    @cooldown.setter
+    def cooldown(self, value):
+        self._cooldown = clamp_value(value, MIN_COOLDOWN, MAX_COOLDOWN)
+
+def dummy_spaceship():
+    # Not in the world, its weapon makes dummy projectiles
+    weapon = Weapon(3, 1, 2, 6, dummy = True)
+    spaceship = Spaceship(weapon = weapon, health = 50, image = IMAGES_SPACESHIPS[0], speed = 5, team = Team.PLAYER,
+                          ability_function = None, ability_duration = 6, cooldown_duration = 6, dummy = True)
+    spaceship.weapon = weapon # The spaceship copies its weapon, the copy is not a dummy
+    DummyControl("Dummy").take_control(spaceship)
+    return spaceship
 
 class InspectorResult():
-     
+
      def __init__(self, status, message = None):
           self.status = status
           self.message = message
 
+_results = {} # (check, function key) -> result
+
+def _function_key(function):
+    # The code of the function and everything it reads from outside, the cells of a
+    # closure and the globals it names. None when the result should not be kept.
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return None
+    try:
+        cells = tuple(cell.cell_contents for cell in function.__closure__ or ())
+    except ValueError:
+        return None # A cell that is not set yet
+    names = function.__globals__
+    key = (code, function.__defaults__, function.__kwdefaults__, cells,
+           tuple((name, names[name]) for name in code.co_names if name in names))
+    try:
+        hash(key)
+    except TypeError:
+        return None # A value that can change, the function runs every time
+    return key
+
+def _sandboxed(evaluate, function):
+    from library import snapshot # Imports the whole game, which imports the inspector
+    state = snapshot.snapshot()
+    try:
+        return evaluate(function)
+    finally:
+        snapshot.restore(state)
+
+def _memoized(check, function, evaluate):
+    key = _function_key(function)
+    if key is None:
+        return _sandboxed(evaluate, function)
+    key = (check, key)
+    result = _results.get(key)
+    if result is None:
+        result = _results[key] = _sandboxed(evaluate, function)
+    return result
+
+def _takes_spaceship(function):
+    return callable(function) and len(signature(function).parameters) == 1
+
+def _total_points(spaceship):
+    return calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
+
+def _ability_result(ability):
+    # (points, error), the points the ability adds to a dummy spaceship or the exception it raised
+    spaceship = dummy_spaceship()
+    points_before = _total_points(spaceship)
+    try:
+        ability(spaceship)
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+    return _total_points(spaceship) - points_before, None
+
 def calculate_ability_points(ability):
-    if callable(ability):
-        sig = signature(ability)
-        if len(sig.parameters) == 1:
-            spaceship = Spaceship(dummySpaceship, dummy=True)
-            points_before = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-            ability(spaceship)
-            points_after = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-            return points_after - points_before
-        
+    # An ability that raises is never under MAX_SPACESHIP_POINTS
+    if _takes_spaceship(ability):
+        points, error = _memoized("ability", ability, _ability_result)
+        return math.inf if error else points
     return 0
 
-def calculate_weapon_points(weapon: Weapon):
-    if isinstance(weapon, Weapon):
-        return (weapon.firerate*weapon.barrels*weapon.damage) + weapon.speed
-    else:
-        return 0
+def ability_function_pass(ability):
+    if _takes_spaceship(ability):
+        points, error = _memoized("ability", ability, _ability_result)
+        if error:
+            return InspectorResult(False, f"Ability function raised {error}")
+    return InspectorResult(True)
 
-def calculate_spaceship_points(spaceship: Spaceship):
-    if isinstance(spaceship, Spaceship):
-        return spaceship.max_health*       MAX_HEALTH_WEIGHT\
-             + spaceship.health*           HEALTH_WEIGHT\
-             + spaceship.speed*            SPEED_WEIGHT\
-             + spaceship.ability_duration* ABILITY_DURATION_WEIGHT\
-             - spaceship.cooldown*         COOLDOWN_WEIGHT\
-             - int(spaceship.collidable)*  COLLIDABLE_WEIGHT\
-             + len(spaceship.childs)*      SPACESHIP_CHILDS_LENGTH_WEIGHT       
-        
-    return 0
+def calculate_weapon_points(weapon):
+    # weapon can be a Weapon, a WeaponBlueprint or WeaponStats
+    if weapon is None:
+        return 0
+    return (weapon.firerate*weapon.barrels*weapon.damage) + weapon.speed
 
+def calculate_spaceship_points(spaceship):
+    # spaceship can be a Spaceship or SpaceshipStats
+    if spaceship is None:
+        return 0
+    return spaceship.max_health*       MAX_HEALTH_WEIGHT\
+         + spaceship.health*           HEALTH_WEIGHT\
+         + spaceship.speed*            SPEED_WEIGHT\
+         + spaceship.ability_duration* ABILITY_DURATION_WEIGHT\
+         - spaceship.cooldown*         COOLDOWN_WEIGHT\
+         - int(spaceship.collidable)*  COLLIDABLE_WEIGHT\
+         + len(spaceship.childs)*      SPACESHIP_CHILDS_LENGTH_WEIGHT
 
-def calculate_points(spaceship: Spaceship):
+def calculate_points(blueprint: SpaceshipBlueprint):
+    if isinstance(blueprint, Spaceship):
+        blueprint = blueprint._blueprint
+    spaceship = SpaceshipStats.from_blueprint(blueprint)
     ability_weight = (spaceship.ability_duration/spaceship.cooldown)
-    return calculate_spaceship_points(spaceship) + \
-           calculate_weapon_points(spaceship.weapon) + \
-           calculate_ability_points(spaceship._ability)*ability_weight
+    return _total_points(spaceship) + calculate_ability_points(blueprint.ability_function)*ability_weight
+
+def _update_function_result(update_func):
+    # The update function runs once without keys and once for every key, each time on a new dummy spaceship
+    points_before = _total_points(dummy_spaceship())
+    erroneous_keys = []
+    erroneous_update_no_key = False
+    for key, name in ((None, None), ("left", "left"), ("right", "right"), ("ability_key", "ability"), ("shooting_key", "shoot")):
+        spaceship = dummy_spaceship()
+        if key:
+            setattr(spaceship.control, key, True)
+        try:
+            update_func(spaceship)
+        except Exception as error:
+            return InspectorResult(False, f"Update function raised {type(error).__name__}: {error}")
+        if _total_points(spaceship) - points_before:
+            if key:
+                erroneous_keys.append(name)
+            else:
+                erroneous_update_no_key = True
+
+    if len(erroneous_keys) > 0 or erroneous_update_no_key:
+        msg_suffix = ''
+        if len(erroneous_keys) > 0:
+            msg_suffix = "\nThe following actions inside update alter the spaceship: " + str.join(', ', erroneous_keys)
+        return InspectorResult(False, "Update function should not alter spaceship's capabilities" + msg_suffix)
+    return InspectorResult(True)
 
 def update_function_pass(update_func):
-    
+
     if not callable(update_func):
         return InspectorResult(False, "Update function provided is not a funtion")
-    else:
-        sig = signature(update_func)
-        if len(sig.parameters) != 1:
-            return InspectorResult(False, "Update function must take 1 argument")
-        else:
-            erroneous_keys = []
-            erroneous_update_no_key = False
-            spaceship = Spaceship(dummySpaceshipBlueprint, dummy=True)
-            dummyControl.take_control(spaceship)
-            points_before = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-
-            update_func(spaceship)
-            points_after_no_key = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-            points_difference_no_key = points_after_no_key - points_before
-            if points_difference_no_key:
-                erroneous_update_no_key = True
+    if len(signature(update_func).parameters) != 1:
+        return InspectorResult(False, "Update function must take 1 argument")
+    return _memoized("update", update_func, _update_function_result)
 
-            dummyControl.left = True
-            spaceship = Spaceship(dummySpaceshipBlueprint, dummy=True)
-            dummyControl.take_control(spaceship)
-            update_func(spaceship)
-            points_after_left = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-            points_difference_left = points_after_left - points_before
-            if points_difference_left:
-                erroneous_keys.append("left")
-            dummyControl.left = False
-
-            dummyControl.right = True
-            spaceship = Spaceship(dummySpaceshipBlueprint, dummy=True)
-            dummyControl.take_control(spaceship)
-            update_func(spaceship)
-            points_after_right = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-            points_difference_right = points_after_right - points_before
-            if points_difference_right:
-                erroneous_keys.append("right")
-            dummyControl.right = False
-
-            dummyControl.ability_key = True
-            spaceship = Spaceship(dummySpaceshipBlueprint, dummy=True)
-            dummyControl.take_control(spaceship)
-            update_func(spaceship)
-            points_after_ability = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-            points_difference_ability = points_after_ability - points_before
-            if points_difference_ability:
-                erroneous_keys.append("ability")
-            dummyControl.ability_key = False
-
-            dummyControl.shooting_key = True
-            spaceship = Spaceship(dummySpaceshipBlueprint, dummy=True)
-            dummyControl.take_control(spaceship)
-            update_func(spaceship)
-            points_after_shoot = calculate_spaceship_points(spaceship) + calculate_weapon_points(spaceship.weapon)
-            points_difference_shoot = points_after_shoot - points_before
-            if points_difference_shoot:
-                erroneous_keys.append("shoot")
-            dummyControl.shooting_key = False
-
-            if len(erroneous_keys) > 0 or erroneous_update_no_key:
-                msg_suffix = ''
-                if len(erroneous_keys) > 0:
-                    msg_suffix = "\nThe following actions inside update alter the spaceship: " + str.join(', ', erroneous_keys)
-                return InspectorResult(False, "Update function should not alter spaceship's capabilities" + msg_suffix)
-            else:
-                return InspectorResult(True)
-            
 def run_inspection(spaceship_blueprint: SpaceshipBlueprint):
-    inspector_results = [] 
+    inspector_results = []
+    ability_result = ability_function_pass(spaceship_blueprint.ability_function)
+    inspector_results.append( ability_result )
     spaceship_points = calculate_points(spaceship_blueprint)
-    print("Spaceship points = ", spaceship_points)
-    if spaceship_points > MAX_SPACESHIP_POINTS:
+    if ability_result.status and spaceship_points > MAX_SPACESHIP_POINTS:
         inspector_results.append( InspectorResult(False, f"The spaceship is overpowered!\nPoints: {spaceship_points} of max: {MAX_SPACESHIP_POINTS}") )
     inspector_results.append( update_function_pass(spaceship_blueprint.update_function) )
 
@@ -156,6 +281,6 @@ def run_inspection(spaceship_blueprint: SpaceshipBlueprint):
             inspection_message += result.message + "\n"
 
     return inspection_message
-    
+
 def run_source_code_inspection(source_code):
-    return re.findall(r'\b_\w+', source_code)
\ No newline at end of file
+    return re.findall(r'\b_\w+', source_code)
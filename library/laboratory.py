@@ -1,10 +1,10 @@
-import random
 import sys
 
 from library.spaceship import Spaceship, default_update
 from library.projectile import Projectile
 from library.pilot import Pilot, Player1, Player2
 from library.utils import Team, world
+from library.rng import rng
 from library.weapon import Weapon
 from library.globals import IMAGES_SPACESHIPS, NUMBER_OF_PLAYERS, NUMBER_OF_ENEMIES
 
@@ -98,29 +98,35 @@ weapons = [
 ############# ENEMIES ################
 
 pilots = []  
-for e in range(0, NUMBER_OF_ENEMIES):
-    pilot = Pilot("Enemy")
-    pilot.take_control( Spaceship(image = random.choice(IMAGES_SPACESHIPS), 
-                                  health = 50, 
-                                  speed = 4, 
-                                  ability_function = random.choice(abilities),
-                                  ability_duration = 6, 
-                                  cooldown_duration = 6, 
-                                  weapon = random.choice(weapons), 
-                                  team=Team.ENEMY) )
-    pilots.append( pilot )
+
+def create_enemies(number_of_enemies = NUMBER_OF_ENEMIES):
+    # The list is refilled in place because game.py holds a reference to it
+    pilots.clear()
+    for e in range(0, number_of_enemies):
+        pilot = Pilot("Enemy")
+        pilot.take_control( Spaceship(image = rng.laboratory.choice(IMAGES_SPACESHIPS), 
+                                      health = 50, 
+                                      speed = 4, 
+                                      ability_function = rng.laboratory.choice(abilities),
+                                      ability_duration = 6, 
+                                      cooldown_duration = 6, 
+                                      weapon = rng.laboratory.choice(weapons), 
+                                      team=Team.ENEMY) )
+        pilots.append( pilot )
+
+create_enemies()
 
 ############# FRIENDS ################
 # friends = []
 # f_agents = []  
 # for f in range(0,2):
-#     friends.append( Spaceship(image = random.choice(IMAGES_SPACESHIPS), 
+#     friends.append( Spaceship(image = rng.laboratory.choice(IMAGES_SPACESHIPS), 
 #                                                 health = 200, 
 #                                                 speed = 4, 
-#                                                 ability_function = random.choice(abilities), 
+#                                                 ability_function = rng.laboratory.choice(abilities), 
 #                                                 ability_duration = 6, 
 #                                                 cooldown_duration = 8, 
-#                                                 weapon = random.choice(weapons), 
+#                                                 weapon = rng.laboratory.choice(weapons), 
 #                                                 team=Team.PLAYER) )
 
   
@@ -132,19 +138,22 @@ for e in range(0, NUMBER_OF_ENEMIES):
 
 ############# PLAYERS ################
 
-player2 = None
-world.player2 = None
-if NUMBER_OF_PLAYERS == 2:
-    player2spaceship = Spaceship(image = random.choice(IMAGES_SPACESHIPS), 
-                        health = 500, 
-                        speed = random.choice([7,8,9]), 
-                        ability_function = random.choice(abilities),
-                        ability_duration = 10, 
-                        cooldown_duration = 2,
-                        update_function = default_update, 
-                        weapon = random.choice(weapons),
-                        team = Team.PLAYER)
-
-    player2 = Player2("Player2")
-    world.player2 = player2spaceship
-    player2.take_control( world.player2 )
\ No newline at end of file
+player2 = Player2("Player2") if NUMBER_OF_PLAYERS == 2 else None
+
+def create_player2():
+    world.player2 = None
+    if player2:
+        player2spaceship = Spaceship(image = rng.laboratory.choice(IMAGES_SPACESHIPS), 
+                            health = 500, 
+                            speed = rng.laboratory.choice([7,8,9]), 
+                            ability_function = rng.laboratory.choice(abilities),
+                            ability_duration = 10, 
+                            cooldown_duration = 2,
+                            update_function = default_update, 
+                            weapon = rng.laboratory.choice(weapons),
+                            team = Team.PLAYER)
+
+        world.player2 = player2spaceship
+        player2.take_control( world.player2 )
+
+create_player2()
\ No newline at end of file
@@ -0,0 +1,279 @@
+import os
+import math
+import json
+import zlib
+import random
+import signal
+import argparse
+from dataclasses import dataclass, asdict, field
+from concurrent.futures import ProcessPoolExecutor
+
+# The optimizer looks for the strongest spaceships the rules allow with a genetic
+# search. A genome is a plain dict of the numbers of a SpaceshipBlueprint and its
+# WeaponBlueprint (and the name of a laboratory ability), always inside the MIN_*
+# and MAX_* bounds of the game and under MAX_SPACESHIP_POINTS as counted by the
+# inspector. Its fitness comes from headless matches against the laboratory
+# enemies (or participant scripts), played with the same seeds for every genome
+# in a pool of processes and scored like a tournament.
+#
+# The search only draws random numbers in this process, so the same --seed makes
+# the same choices whenever the results of the matches are the same, and they
+# are because the matches are seeded. Evaluated genomes are appended to a
+# checkpoint file: running the same command again plays only the genomes that
+# are not in it, an interrupted search resumes where it stopped and a longer one
+# (more --generations) starts from the end of the shorter one.
+
+import library.simulation # Imports the game without a window before the modules below
+
+from library.blueprints import SpaceshipBlueprint, WeaponBlueprint
+from library.spaceship import default_update
+from library.laboratory import abilities
+from library.inspector import calculate_points
+from library.tournament import POINTS, MatchTimeout, raise_match_timeout, script_blueprint
+from library.globals import Team, IMAGES_SPACESHIPS, MAX_SPACESHIP_POINTS, MIN_COOLDOWN, MAX_COOLDOWN, MIN_ABILITY_DURATION, MAX_ABILITY_DURATION
+from library.globals import MIN_WEAPON_FIRERATE, MAX_WEAPON_FIRERATE, MIN_WEAPON_BARRELS, MAX_WEAPON_BARRELS, MIN_WEAPON_SPREAD_ANGLE, MAX_WEAPON_SPREAD_ANGLE, MIN_WEAPON_RANDOMNESS, MAX_WEAPON_RANDOMNESS
+from library.globals import MIN_PROJECTILE_DAMAGE, MAX_PROJECTILE_DAMAGE, MIN_PROJECTILE_SPEED, MAX_PROJECTILE_SPEED
+
+MATCH_TICKS = 3*60*60 # 3 minutes of game time per match
+TIME_LIMIT = 120 # Seconds of wall clock per match
+ABILITIES = {ability.__name__: ability for ability in abilities}
+UPDATE_FUNCTION = default_update # Flies the spaceship with the controls of its pilot, like the enemies
+
+# name: (minimum, maximum, whole numbers). The game has no bounds for the health
+# and the speed of a spaceship, the points cap keeps them low anyway.
+GENES = {"health":           (10, 400, True),
+         "speed":            (1, 15, True),
+         "ability_duration": (MIN_ABILITY_DURATION, MAX_ABILITY_DURATION, False),
+         "cooldown":         (MIN_COOLDOWN, MAX_COOLDOWN, False),
+         "firerate":         (MIN_WEAPON_FIRERATE, MAX_WEAPON_FIRERATE, False),
+         "barrels":          (MIN_WEAPON_BARRELS, MAX_WEAPON_BARRELS, True),
+         "damage":           (MIN_PROJECTILE_DAMAGE, MAX_PROJECTILE_DAMAGE, False),
+         "bullet_speed":     (MIN_PROJECTILE_SPEED, MAX_PROJECTILE_SPEED, False),
+         "spread_angle":     (MIN_WEAPON_SPREAD_ANGLE, MAX_WEAPON_SPREAD_ANGLE, True),
+         "randomness":       (MIN_WEAPON_RANDOMNESS, MAX_WEAPON_RANDOMNESS, True)}
+
+# Genes that make a spaceship cheaper when they go down (1) or up (-1), used to bring genomes under the cap
+CHEAPER = {"health": 1, "speed": 1, "ability_duration": 1, "cooldown": -1, "firerate": 1, "barrels": 1, "damage": 1, "bullet_speed": 1}
+
+def fix_gene(name, value):
+    minimum, maximum, whole = GENES[name]
+    value = min(max(value, minimum), maximum)
+    return int(round(value)) if whole else round(value, 1) # Rounded, so that close genomes are the same genome
+
+def blueprint(genome):
+    weapon = WeaponBlueprint(genome["firerate"], genome["barrels"], genome["damage"], genome["bullet_speed"],
+                             genome["spread_angle"], genome["randomness"])
+    return SpaceshipBlueprint(image = IMAGES_SPACESHIPS[0],
+                              health = genome["health"],
+                              speed = genome["speed"],
+                              ability_duration = genome["ability_duration"],
+                              cooldown_duration = genome["cooldown"],
+                              ability_function = ABILITIES[genome["ability"]],
+                              update_function = UPDATE_FUNCTION,
+                              weapon = weapon,
+                              team = Team.PLAYER)
+
+def points(genome):
+    return calculate_points(blueprint(genome))
+
+def genome_key(genome):
+    return json.dumps(genome, sort_keys = True)
+
+def random_genome(rnd):
+    genome = {name: fix_gene(name, rnd.uniform(minimum, maximum)) for name, (minimum, maximum, whole) in GENES.items()}
+    genome["ability"] = rnd.choice(sorted(ABILITIES))
+    return genome
+
+def repair(genome, rnd):
+    # Moves random genes a fifth of their range towards their cheap end until the spaceship is under the cap
+    genome = dict(genome)
+    names = sorted(CHEAPER)
+    while points(genome) > MAX_SPACESHIP_POINTS:
+        name = rnd.choice(names)
+        minimum, maximum, whole = GENES[name]
+        genome[name] = fix_gene(name, genome[name] - CHEAPER[name]*max((maximum - minimum)/5, 1))
+    return genome
+
+def crossover(a, b, rnd):
+    return {name: (a if rnd.random() < 0.5 else b)[name] for name in a}
+
+def mutate(genome, rnd, rate):
+    genome = dict(genome)
+    for name, (minimum, maximum, whole) in GENES.items():
+        if rnd.random() < rate:
+            genome[name] = fix_gene(name, rnd.gauss(genome[name], (maximum - minimum)/10))
+    if rnd.random() < rate:
+        genome["ability"] = rnd.choice(sorted(ABILITIES))
+    return genome
+
+@dataclass
+class Evaluation():
+
+    key: str
+    genome: dict
+    won: int = 0
+    drawn: int = 0
+    lost: int = 0
+    margin: float = 0 # Health left minus the health of the opponents, summed over the matches
+    seeds: list = field(default_factory = list)
+    opponents: list = field(default_factory = list)
+    max_ticks: int = 0
+    update_function: str = "" # The name of the function that flew the spaceship
+    error: str = None
+
+    @property
+    def score(self):
+        # Tournament points, the health margin breaks ties. Genomes that failed come last.
+        if self.error:
+            return (-math.inf, -math.inf)
+        return (self.won*POINTS["won"] + self.drawn*POINTS["drawn"] + self.lost*POINTS["lost"], self.margin)
+
+def evaluate(key, genome, seeds, opponents, max_ticks, time_limit):
+    # Runs inside a worker process, plays every opponent (None for the laboratory enemies) with every seed
+    from library.simulation import Simulation
+
+    evaluation = Evaluation(key, genome, seeds = seeds, opponents = opponents, max_ticks = max_ticks,
+                            update_function = UPDATE_FUNCTION.__name__)
+    player = blueprint(genome)
+    alarm = time_limit and hasattr(signal, "setitimer")
+    if alarm:
+        signal.signal(signal.SIGALRM, raise_match_timeout)
+    try:
+        for opponent in opponents:
+            enemy = script_blueprint(opponent) if opponent else None
+            for seed in seeds:
+                if alarm:
+                    signal.setitimer(signal.ITIMER_REAL, time_limit + 5)
+                simulation = Simulation(player, enemy, seed)
+                try:
+                    result = simulation.run(max_ticks, time_limit)
+                except MatchTimeout:
+                    result = simulation.result(time_limit, timed_out = True)
+                if result.end_game == 1:
+                    evaluation.won += 1
+                elif result.end_game == -1:
+                    evaluation.lost += 1
+                else:
+                    evaluation.drawn += 1
+                evaluation.margin += result.player_health - result.enemy_health
+    except Exception as exception:
+        evaluation.error = f"{exception.__class__.__name__}: {exception}"
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return evaluation
+
+class Optimizer():
+
+    def __init__(self, population = 24, generations = 20, matches = 3, opponents = None, seed = 0, max_ticks = MATCH_TICKS,
+                 time_limit = TIME_LIMIT, workers = None, checkpoint = None, elite = 2, mutation_rate = 0.2):
+        self.population = population
+        self.generations = generations
+        self.seed = seed
+        self.seeds = [zlib.crc32(f"{seed}:{match}".encode()) for match in range(matches)] # The same for every genome
+        self.opponents = [os.path.abspath(path) for path in opponents] if opponents else [None]
+        self.max_ticks = max_ticks
+        self.time_limit = time_limit
+        self.workers = workers or os.cpu_count()
+        self.checkpoint = checkpoint
+        self.elite = elite
+        self.mutation_rate = mutation_rate
+        self.evaluations = {}
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint, encoding = "utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                evaluation = Evaluation(**json.loads(line))
+                # Genomes evaluated with other matches do not count
+                if evaluation.seeds == self.seeds and evaluation.opponents == self.opponents \
+                   and evaluation.max_ticks == self.max_ticks and evaluation.update_function == UPDATE_FUNCTION.__name__ \
+                   and evaluation.error is None:
+                    self.evaluations[evaluation.key] = evaluation
+
+    def _save(self, evaluation):
+        self.evaluations[evaluation.key] = evaluation
+        if self.checkpoint:
+            with open(self.checkpoint, "a", encoding = "utf-8") as file:
+                file.write(json.dumps(asdict(evaluation)) + "\n")
+
+    def evaluate(self, genomes, executor):
+        # The evaluations of the genomes, only the missing ones are played
+        keys = [genome_key(genome) for genome in genomes]
+        missing = {key: genome for key, genome in zip(keys, genomes) if key not in self.evaluations}
+        futures = [executor.submit(evaluate, key, genome, self.seeds, self.opponents, self.max_ticks, self.time_limit)
+                   for key, genome in missing.items()]
+        for future in futures:
+            self._save(future.result())
+        return [self.evaluations[key] for key in keys], len(missing)
+
+    def _select(self, ranked, rnd):
+        # Tournament selection of three
+        return min(rnd.sample(range(len(ranked)), min(3, len(ranked))))
+
+    def run(self, report = print):
+        rnd = random.Random(self.seed)
+        genomes = [repair(random_genome(rnd), rnd) for i in range(self.population)]
+        best = None
+        with ProcessPoolExecutor(max_workers = self.workers) as executor:
+            for generation in range(1, self.generations + 1):
+                evaluations, played = self.evaluate(genomes, executor)
+                ranked = sorted(evaluations, key = lambda evaluation: evaluation.score, reverse = True)
+                if best is None or ranked[0].score > best.score:
+                    best = ranked[0]
+                if report:
+                    report(f"Generation {generation}: best {describe(ranked[0])}"
+                           + (f", {played} genomes played" if played < len(genomes) else ""))
+
+                children = [evaluation.genome for evaluation in ranked[:self.elite]]
+                while len(children) < self.population:
+                    a = ranked[self._select(ranked, rnd)].genome
+                    b = ranked[self._select(ranked, rnd)].genome
+                    children.append(repair(mutate(crossover(a, b, rnd), rnd, self.mutation_rate), rnd))
+                genomes = children
+        return best
+
+def describe(evaluation):
+    matches = evaluation.won + evaluation.drawn + evaluation.lost
+    if evaluation.error:
+        return f"failed ({evaluation.error})"
+    return (f"won {evaluation.won}, drawn {evaluation.drawn}, lost {evaluation.lost} of {matches}, "
+            f"health {evaluation.margin:+.0f}, {points(evaluation.genome):.1f} points")
+
+def format_blueprint(genome):
+    # Python code of the spaceship, for a participant script or the laboratory
+    return (f"Spaceship(update_function = {UPDATE_FUNCTION.__name__}, health = {genome['health']}, speed = {genome['speed']}, ability_function = {genome['ability']},\n"
+            f"          ability_duration = {genome['ability_duration']}, cooldown_duration = {genome['cooldown']},\n"
+            f"          weapon = Weapon(firerate = {genome['firerate']}, barrels = {genome['barrels']}, damage = {genome['damage']}, "
+            f"speed = {genome['bullet_speed']},\n"
+            f"                          spread_angle = {genome['spread_angle']}, randomness = {genome['randomness']}))")
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Search for the strongest spaceship under the points cap with a genetic algorithm.")
+    parser.add_argument("opponents", nargs = "*", help = "participant scripts to play against (default: the laboratory enemies)")
+    parser.add_argument("--population", type = int, default = 24, help = "genomes per generation (default 24)")
+    parser.add_argument("--generations", type = int, default = 20, help = "number of generations (default 20)")
+    parser.add_argument("--matches", type = int, default = 3, help = "seeded matches per genome and opponent (default 3)")
+    parser.add_argument("--ticks", type = int, default = MATCH_TICKS, help = f"maximum ticks per match (default {MATCH_TICKS})")
+    parser.add_argument("--timeout", type = float, default = TIME_LIMIT, help = f"seconds per match (default {TIME_LIMIT})")
+    parser.add_argument("--workers", type = int, help = "number of processes (default: one per core)")
+    parser.add_argument("--seed", type = int, default = 0, help = "search seed, the same seed makes the same search")
+    parser.add_argument("--checkpoint", default = "optimizer.jsonl",
+                        help = "file of the evaluated genomes, to resume an interrupted search (default optimizer.jsonl)")
+    args = parser.parse_args(argv)
+
+    optimizer = Optimizer(args.population, args.generations, args.matches, args.opponents, args.seed, args.ticks,
+                          args.timeout, args.workers, args.checkpoint)
+    if optimizer.evaluations:
+        print(f"Resuming: {len(optimizer.evaluations)} genomes already evaluated")
+    best = optimizer.run()
+    print()
+    print(f"Best spaceship: {describe(best)}")
+    print(format_blueprint(best.genome))
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-import random
+from operator import attrgetter
 
+import numpy
 from pgzero.keyboard import keyboard
 
-from library.globals import WIDTH, HEIGHT
+from library.globals import WIDTH, HEIGHT, PILOT_DECISION_TICKS
+from library.scheduler import scheduler
+from library.rng import rng
+
+TURN_CHANCE = 0.02 # Chance of a pilot to change direction in a frame
+ABILITY_CHANCE = 0.02 # Chance of a pilot to activate the ability in a frame
+EDGE = 10 # Pilots closer than that to the side of the screen turn back
+CONTROLS = ("left", "right", "ability_key", "shooting_key")
 
 class Pilot():
 
@@ -27,15 +35,15 @@ class Pilot():
             if self.ability_key:
                 self.ability_key = False
 
-            if random.random() < 0.02:
+            if rng.pilots.random() < TURN_CHANCE:
                 self.left = not self.left
                 self.right = not self.right
 
             if self.puppet:
-                if self.puppet.x <= 10:
+                if self.puppet.x <= EDGE:
                     self.left = False
                     self.right = True
-                elif self.puppet.x >= WIDTH-10:
+                elif self.puppet.x >= WIDTH-EDGE:
                     self.left = True
                     self.right = False
         else:
@@ -44,9 +52,59 @@ class Pilot():
             self.ability_key = False
             self.shooting_key = False 
 
-        if random.random() < 0.02:
+        if rng.pilots.random() < ABILITY_CHANCE:
             self.ability_key = True
 
+class PilotBatch():
+    # With many enemies (the horde modes) the pilots decide together: their controls
+    # are gathered in arrays, every decision of Pilot.think() is made for all of them
+    # with a few numpy operations and the controls are written back. With
+    # decision_ticks above 1 they decide only every that many frames and keep their
+    # controls in between, the chances grow so that they change their minds as often
+    # per second as before.
+
+    def __init__(self, decision_ticks = PILOT_DECISION_TICKS):
+        self.decision_ticks = max(1, decision_ticks)
+        self.turn_chance = 1 - (1 - TURN_CHANCE)**self.decision_ticks
+        self.ability_chance = 1 - (1 - ABILITY_CHANCE)**self.decision_ticks
+
+    def think(self, pilots, surroundings):
+        # The frame count of the scheduler is part of the snapshots, a restored match decides on the same frames
+        if not pilots or scheduler.tick % self.decision_ticks:
+            return
+        player = surroundings[0] #0 index is the player
+        count = len(pilots)
+        randoms = numpy.random.default_rng(rng.pilots.getrandbits(64)).random((2, count))
+
+        controls = [numpy.fromiter(map(attrgetter(name), pilots), bool, count) for name in CONTROLS]
+        if player.alive:
+            left, right, ability, shooting = [control.copy() for control in controls]
+            puppets = [pilot.puppet for pilot in pilots]
+            # Actor.x without the attribute lookups of pgzero, the same as queue_actors() in library.render
+            x = numpy.fromiter([puppet._rect.x + puppet._anchor[0] if puppet else WIDTH/2 for puppet in puppets], float, count)
+
+            turn = randoms[0] < self.turn_chance
+            left ^= turn
+            right ^= turn
+            at_left = x <= EDGE
+            at_right = x >= WIDTH - EDGE
+            left = (left & ~at_left) | at_right
+            right = (right & ~at_right) | at_left
+        else:
+            left = right = shooting = numpy.zeros(count, bool)
+        ability = randoms[1] < self.ability_chance
+
+        # Only the pilots that change their minds are written back, a few of them in most frames
+        decided = (left, right, ability, shooting)
+        changed = numpy.zeros(count, bool)
+        for control, decision in zip(controls, decided):
+            changed |= control != decision
+        for index in numpy.flatnonzero(changed).tolist():
+            pilot = pilots[index]
+            pilot.left, pilot.right, pilot.ability_key, pilot.shooting_key = [bool(decision[index]) for decision in decided]
+
+pilot_batch = PilotBatch()
+
 class Player1():
      
     def __init__(self, name, puppet = None):
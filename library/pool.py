@@ -0,0 +1,51 @@
+# Projectiles, effects and asteroids are created and thrown away all the time.
+# A Pool keeps the instances that left the world and gives them back on the next
+# acquire() instead of building a new Actor. Recycled instances are
+# re-initialised by calling __init__ again, their classes skip the work that is
+# still valid from their previous life (same image, same angle).
+#
+# Be aware that a reference kept to an object after it left the world may point
+# to a recycled object later on.
+
+pools = []
+
+class Pool():
+
+    def __init__(self, name, factory, size):
+        self.name = name
+        self.factory = factory
+        self.size = size # Maximum number of free instances kept
+        self._free = []
+        self.hits = 0    # Acquires served by a recycled instance
+        self.misses = 0  # Acquires that had to create a new instance
+        self.dropped = 0 # Released instances not kept because the pool was full
+        pools.append(self)
+
+    def acquire(self, *args, **kwargs):
+        if self._free:
+            self.hits += 1
+            obj = self._free.pop()
+            obj.__init__(*args, **kwargs)
+            return obj
+        self.misses += 1
+        return self.factory(*args, **kwargs)
+
+    def release(self, obj):
+        if len(self._free) < self.size:
+            self._free.append(obj)
+        else:
+            self.dropped += 1
+
+    def clear(self):
+        self._free = []
+
+    def statistics(self):
+        acquires = self.hits + self.misses
+        return {"free" : len(self._free),
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "dropped" : self.dropped,
+                "hit_rate" : self.hits/acquires if acquires else 0}
+
+def pool_statistics():
+    return {pool.name: pool.statistics() for pool in pools}
@@ -1,11 +1,12 @@
-import random
-
-from library.utils import Object
+from library.utils import Object, COLLISIONS, world
+from library.rng import rng
 from library.globals import WIDTH, HEIGHT, IMAGES_POWERUPS, Type, Team
 from library.spaceship import Spaceship 
 
 class Powerup(Object):
 
+    type = Type.POWERUP
+
     def __init__(self, image, pos, effect = None, speed = 3, direction = 180):
         super().__init__(image=image, pos=pos, speed=speed, direction=direction)
         self.effect = effect
@@ -16,27 +17,37 @@ class Powerup(Object):
         if self.y <= -50 or self.y >= self.bounds[1] + 50:
             self.alive = False
 
-    def collide(self, object):
-        super().collide(object)
-        if object.type != Type.PROJECTILE and object.type != Type.REFLECTOR and object.team != Team.ENEMY:
+    def _picked_up(self, object):
+        if object.team != Team.ENEMY:
             self.alive = False
 
+# Projectiles and reflectors pass through powerups
+COLLISIONS[Type.POWERUP, Type.SPACESHIP] = Powerup._picked_up
+COLLISIONS[Type.POWERUP, Type.ASTEROID] = Powerup._picked_up
+COLLISIONS[Type.POWERUP, Type.POWERUP] = Powerup._picked_up
+
 def repair(spaceship: Spaceship):
     '''+20 health'''
     spaceship.health += 20
 
 def weapon_plus(spaceship: Spaceship):
     '''+1 weapon'''
+    if spaceship.weapon is None:
+        return # Nothing to upgrade
     spaceship.weapon.barrels += 1
     spaceship._blueprint.weapon.barrels += 1
 
 def projectile_upgrade(spaceship: Spaceship):
     '''+1 damage'''
+    if spaceship.weapon is None:
+        return
     spaceship.weapon.damage += 1
     spaceship._blueprint.weapon.damage += 1
 
 def generate_random_powerup(position = None):
-    random_number = random.random()
+    if not world.budget.admit(Type.POWERUP):
+        return
+    random_number = rng.powerups.random()
     if random_number < 0.33:
         name = "repair"
         effect = repair
@@ -47,5 +58,5 @@ def generate_random_powerup(position = None):
         name = "projectile_upgrade"
         effect = projectile_upgrade
     Powerup( image = IMAGES_POWERUPS[name], 
-             pos = position if position else (random.randint(-80,WIDTH), -30),
+             pos = position if position else (rng.powerups.randint(-80,WIDTH), -30),
             effect= effect)
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import functools
+from collections import deque
+from dataclasses import dataclass
+
+import pygame
+from pgzero import ptext
+
+from library.utils import world
+from library.entities import projectile_store, asteroid_store
+from library.globals import FPS, PROFILER, PROFILER_FRAMES
+
+# The profiler times the phases of every frame while it is recording. The phases
+# of game.py are decorated with profiler.timed (game.update with profiler.frame,
+# which also starts a new frame) and parts of a phase are timed with
+# "with profiler.section(name):". While it is not recording all this costs one
+# check per phase.
+#
+# In the window F3 shows an overlay with the time of the last frames and of every
+# phase and F4 saves the kept frames as a trace that chrome://tracing or
+# https://ui.perfetto.dev can open.
+
+TRACES_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "traces")
+OVERLAY_FRAMES = 60 # The times of the overlay are averages of the last second
+FRAME_BUDGET = 1000/FPS # Milliseconds
+
+@dataclass
+class Frame():
+
+    start: int # Nanoseconds of time.perf_counter_ns()
+    end: int
+    events: list # (name, depth, start, end) in the order they ended
+    counts: dict # Entities alive at the end of the frame
+    work: float # Milliseconds spent in the outermost phases, without the wait for the next frame
+
+class FrameProfiler():
+
+    def __init__(self, frames = PROFILER_FRAMES, recording = PROFILER):
+        self.recording = recording # Takes effect from the next frame
+        self.overlay = False
+        self.frames = deque(maxlen = frames)
+        self._frame_start = None # None while the current frame is not recorded
+        self._events = []
+        self._stack = []
+        self._section = None
+        self._summary = None
+        self._summary_frame = 0
+        self._panel = None
+
+    def next_frame(self):
+        now = time.perf_counter_ns()
+        if self._frame_start is not None:
+            work = sum([end - start for name, depth, start, end in self._events if depth == 0])/1e6
+            self.frames.append(Frame(self._frame_start, now, self._events, counts(), work))
+        self._frame_start = now if self.recording else None
+        self._events = []
+        self._stack = []
+
+    def begin(self, name):
+        if self._frame_start is not None:
+            self._stack.append((name, time.perf_counter_ns()))
+
+    def end(self):
+        if self._stack:
+            name, start = self._stack.pop()
+            self._events.append((name, len(self._stack), start, time.perf_counter_ns()))
+
+    def timed(self, function):
+        name = function.__name__
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            if self._frame_start is None:
+                return function(*args, **kwargs)
+            self.begin(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.end()
+        return timed_function
+
+    def frame(self, function):
+        # For the function called first in every frame
+        timed_function = self.timed(function)
+        @functools.wraps(function)
+        def frame_function(*args, **kwargs):
+            self.next_frame()
+            return timed_function(*args, **kwargs)
+        return frame_function
+
+    def section(self, name):
+        self._section = name
+        return self
+
+    def __enter__(self):
+        self.begin(self._section)
+
+    def __exit__(self, *exception):
+        self.end()
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        if self.overlay:
+            self.recording = True
+
+    def clear(self):
+        self.frames.clear()
+        self._summary = None
+
+    ######## Overlay ########
+
+    def summary(self):
+        # Averages of the last frames, computed again twice per second
+        frames = list(self.frames)[-OVERLAY_FRAMES:]
+        if not frames:
+            return None
+        if self._summary is not None and frames[-1].start - self._summary_frame < 5e8:
+            return self._summary
+
+        phases = {} # (depth, name) -> milliseconds, in the order they first ran
+        for frame in frames:
+            for name, depth, start, end in sorted(frame.events, key = lambda event: event[2]):
+                phases[(depth, name)] = phases.get((depth, name), 0) + (end - start)/1e6
+        works = [frame.work for frame in frames]
+        self._summary = {"work": sum(works)/len(works),
+                         "worst": max(works),
+                         "phases": [(depth, name, total/len(frames)) for (depth, name), total in phases.items()],
+                         "counts": frames[-1].counts}
+        self._summary_frame = frames[-1].start
+        return self._summary
+
+    def draw_overlay(self, surface):
+        summary = self.summary()
+        lines = ["Profiler (F3 hides, F4 saves a trace)"]
+        if summary:
+            lines.append(f"frame {summary['work']:.2f} ms, worst {summary['worst']:.2f} ms of {FRAME_BUDGET:.1f}")
+            lines += [f"{'  '*depth}{name} {ms:.3f}" for depth, name, ms in summary["phases"]]
+            lines.append("  ".join([f"{name} {count}" for name, count in summary["counts"].items()]))
+        text = ptext.getsurf("\n".join(lines), fontsize = 14, color = (230, 230, 230))
+
+        x, y, graph_height = 10, 10, 60
+        width = max(text.get_width() + 12, 320)
+        height = text.get_height() + graph_height + 16
+        if self._panel is None or self._panel.get_size() != (width, height):
+            self._panel = pygame.Surface((width, height), pygame.SRCALPHA)
+            self._panel.fill((0, 0, 0, 170))
+        surface.blit(self._panel, (x, y))
+        surface.blit(text, (x + 6, y + 4))
+
+        # One bar per frame, the line is the time of a frame at FPS frames per second
+        bottom = y + height - 6
+        frames = list(self.frames)[-(width - 12):]
+        for i, frame in enumerate(frames):
+            work = frame.work
+            height = min(graph_height, graph_height*work/(2*FRAME_BUDGET))
+            color = (93, 152, 37) if work <= FRAME_BUDGET else (200, 60, 50)
+            surface.fill(color, (x + 6 + i, bottom - height, 1, height))
+        surface.fill((200, 178, 52), (x + 6, bottom - graph_height//2, width - 12, 1))
+
+    ######## Traces ########
+
+    def trace(self):
+        # The kept frames as Chrome trace events, times in microseconds from the first frame
+        frames = list(self.frames)
+        events = []
+        if not frames:
+            return {"traceEvents": events}
+        origin = frames[0].start
+        def microseconds(ns):
+            return (ns - origin)/1000
+        for number, frame in enumerate(frames):
+            events.append({"name": "frame", "cat": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": microseconds(frame.start), "dur": (frame.end - frame.start)/1000, "args": {"frame": number}})
+            for name, depth, start, end in frame.events:
+                events.append({"name": name, "cat": "phase", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": microseconds(start), "dur": (end - start)/1000})
+            events.append({"name": "entities", "ph": "C", "pid": 1, "tid": 1, "ts": microseconds(frame.end), "args": frame.counts})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_trace(self, path = None):
+        if path is None:
+            os.makedirs(TRACES_FOLDER, exist_ok = True)
+            path = os.path.join(TRACES_FOLDER, f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w", encoding = "utf-8") as file:
+            json.dump(self.trace(), file)
+        return path
+
+def counts():
+    return {"objects": len(world.objects),
+            "projectiles": projectile_store.count,
+            "asteroids": asteroid_store.count,
+            "effects": len(world.effects),
+            "guis": len(world.guis)}
+
+profiler = FrameProfiler()
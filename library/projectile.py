@@ -1,8 +1,13 @@
-from library.utils import Object, clamp_value
-from library.globals import WIDTH, HEIGHT, MIN_PROJECTILE_DAMAGE, MAX_PROJECTILE_DAMAGE, MIN_PROJECTILE_SPEED, MAX_PROJECTILE_SPEED,Type, Team
+from library.utils import COLLISIONS, clamp_value
+from library.entities import StoredObject, projectile_store
+from library.pool import Pool
+from library.globals import WIDTH, HEIGHT, MIN_PROJECTILE_DAMAGE, MAX_PROJECTILE_DAMAGE, MIN_PROJECTILE_SPEED, MAX_PROJECTILE_SPEED, PROJECTILE_POOL_SIZE, Type, Team
 from library.effects import explosion
 
-class Projectile(Object):
+class Projectile(StoredObject):
+
+    type = Type.PROJECTILE
+    store = projectile_store
 
     def __init__(self, image = 'projectiles/projectilemissile1', pos = (0,0), speed = 8, health = 1, spin = 0, damage = 1, source = None, team = Team.NEUTRAL, direction = 0, dummy = False):
         if team == Team.ENEMY:
@@ -27,19 +32,27 @@ class Projectile(Object):
     @speed.setter
     def speed(self, value):
         self._speed = clamp_value(value, MIN_PROJECTILE_SPEED, MAX_PROJECTILE_SPEED)
+        self._update_velocity()
+
+    def _on_remove(self):
+        super()._on_remove()
+        projectile_pool.release(self)
+
+    def _reflect(self, reflector):
+        self.bounce(rotate = True)
+        self.team = reflector.team
+
+    def _explode(self, spaceship):
+        self.alive = False
+        explosion(self.next_pos()) 
+
+    def _hit(self, object):
+        self.health -= object.damage
+        explosion(self.next_pos())
+
+COLLISIONS[Type.PROJECTILE, Type.REFLECTOR] = Projectile._reflect
+COLLISIONS[Type.PROJECTILE, Type.SPACESHIP] = Projectile._explode
+COLLISIONS[Type.PROJECTILE, Type.ASTEROID] = Projectile._hit
+COLLISIONS[Type.PROJECTILE, Type.PROJECTILE] = Projectile._hit
 
-    def update(self):
-        self.move_to_next_pos()
-        if self.y <= -10 or self.y >= (HEIGHT + 10) or self.health <= 0:
-            self.alive = False
-
-    def collide(self, object):
-        if object.type == Type.REFLECTOR:
-            self.bounce(rotate = True)
-            self.team = object.team
-        elif object.type == Type.SPACESHIP:
-            self.alive = False
-            explosion(self.next_pos()) 
-        elif object.type != Type.POWERUP:
-            self.health -= object.damage
-            explosion(self.next_pos())
\ No newline at end of file
+projectile_pool = Pool("projectiles", Projectile, PROJECTILE_POOL_SIZE)
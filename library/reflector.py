@@ -1,9 +1,12 @@
 from pgzero.loaders import sounds
 
 from library.utils import Object
-from library.globals import Team
+from library.globals import Team, Type
 
 class Reflector(Object):
+
+    type = Type.REFLECTOR # Nothing happens to reflectors when they collide
+
     def __init__(self, image = 'others/metal_wall', pos = (0,0), health = 20, timespan = 5, team = Team.NEUTRAL):
         super().__init__(image, pos, health=health, timespan=timespan, team=team)
         # sounds.sfx_shield_up.play()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import pygame
+from pygame import Rect
+from pgzero import game
+from pgzero.actor import Actor
+
+from library.utils import background
+from library.gui import queue_guis
+from library.globals import WIDTH, HEIGHT
+
+# With dirty rectangles (the dirty_rects setting) the background is drawn again
+# only under the places where something was drawn in the last frame or is drawn
+# in this one, and only those places are updated on the display instead of the
+# whole window. Everything is still drawn every frame, so nothing needs to tell
+# the renderer that it moved or changed.
+#
+# pgzero flips the whole display after draw() and has no way to change that, so
+# install() replaces pygame.display.flip. The screen is drawn and updated whole
+# again when the rectangles would cover most of it or when full_redraw() was
+# called (the profiler overlay calls it every frame).
+
+# The sprites of a frame (objects, guis and effects, in the order of their layers)
+# can also be drawn with one Surface.blits() call instead of an Actor.draw() per
+# sprite, see draw_sprites(). Texts are the exception, they are drawn on their own
+# in between.
+
+FULL_REDRAW_AREA = 0.5 # Fraction of the screen above which the whole screen is drawn and updated
+
+def screen_rect(item):
+    # Where the item will be drawn, None if it is not drawn. Actors are drawn at
+    # their (not rounded) top left corner, the rect is a pixel larger on every side.
+    if isinstance(item, Actor):
+        width, height = item._surf.get_size()
+        return Rect(int(item.left) - 1, int(item.top) - 1, width + 2, height + 2)
+    return item.screen_rect()
+
+class DirtyRects():
+
+    def __init__(self):
+        self.enabled = False # Set by install()
+        self._screen = Rect(0, 0, WIDTH, HEIGHT)
+        self._previous = [] # Rects drawn in the last frame
+        self._update = None # Rects to update on the display, None for the whole display
+        self._flip = pygame.display.flip
+        self._full = True
+
+    def install(self):
+        self.enabled = True
+        self._full = True
+        pygame.display.flip = self.flip
+
+    def full_redraw(self):
+        # The whole display is updated after this frame and the next one is drawn whole
+        self._full = True
+        self._update = None
+
+    def draw_background(self, items):
+        # Called instead of background.draw() before anything else is drawn, with everything that will be drawn
+        screen = self._screen
+        rects = [rect.clip(screen) for rect in map(screen_rect, items) if rect is not None]
+        rects = [rect for rect in rects if rect.width and rect.height]
+        dirty = self._previous + rects
+        self._previous = rects
+        if self._full or sum([rect.width*rect.height for rect in dirty]) > FULL_REDRAW_AREA*screen.width*screen.height:
+            self._full = False
+            self._update = None
+            background.draw()
+            return
+        self._update = dirty
+        offset = (-int(background.left), -int(background.top))
+        surface = background._surf
+        game.screen.blits([(surface, rect, rect.move(offset)) for rect in dirty], doreturn = False)
+
+    def flip(self):
+        if self._update is None:
+            self._flip()
+        else:
+            pygame.display.update(self._update)
+
+dirty_rects = DirtyRects()
+
+def queue_actors(actors, blits):
+    # What Actor.draw() blits, _rect.topleft is the topleft of the actor
+    blits += [(actor._surf, actor._rect.topleft) for actor in actors]
+
+def draw_sprites(layers):
+    # layers are lists of guis or of actors, drawn in their order
+    blits = []
+    for kind, items in layers:
+        if kind == "guis":
+            queue_guis(items, blits)
+        else:
+            queue_actors(items, blits)
+    if blits:
+        game.screen.blits(blits, doreturn = False)
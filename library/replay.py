@@ -0,0 +1,417 @@
+import os
+import sys
+import zlib
+import time
+import struct
+import argparse
+from array import array
+from dataclasses import dataclass, field
+
+# A replay does not store what happened, only what is needed to make it happen
+# again: the seed of the random streams (library.rng), the participant scripts
+# and the controls (left, right, ability, shoot) of every spaceship for every tick.
+# Four bits per spaceship and tick, compressed, make a 10 minutes match a few KB.
+# Playing a replay re-simulates the match headless with the recorded controls and
+# compares a checksum of the final world with the recorded one.
+#
+# Replays can also keep keyframes, the full state of the match (library.snapshot)
+# every few seconds. Jumping to a tick then restores the closest keyframe before it
+# and only simulates the ticks after the keyframe.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+REPLAYS_FOLDER = os.path.join(ROOT, "replays")
+
+MAGIC = b"PGZR"
+VERSION = 2
+HEADER = struct.Struct("<4sBBIbI") # magic, version, controllers, ticks, end_game, checksum
+KEYFRAME_SECONDS = 10 # Seconds between the keyframes added to replays
+SPEEDS = [1, 2, 4, 8]
+
+LEFT = 1
+RIGHT = 2
+ABILITY = 4
+SHOOTING = 8
+
+def control_bits(control):
+    return (LEFT if control.left else 0) | (RIGHT if control.right else 0) | \
+           (ABILITY if control.ability_key else 0) | (SHOOTING if control.shooting_key else 0)
+
+def set_control_bits(control, bits):
+    control.left = bool(bits & LEFT)
+    control.right = bool(bits & RIGHT)
+    control.ability_key = bool(bits & ABILITY)
+    control.shooting_key = bool(bits & SHOOTING)
+
+def controllers():
+    # Always in the same order: player 1, player 2, the enemies
+    from library.utils import world
+    spaceships = [world.player1] + ([world.player2] if world.player2 else []) + world.enemy_spaceships
+    return [spaceship.control for spaceship in spaceships]
+
+def world_checksum():
+    # Any difference in a position or health of any object changes the checksum
+    from library.utils import world
+    values = array("d", [world.end_game])
+    for obj in world.objects:
+        values.extend((obj._rect.x, obj._rect.y, obj._health))
+    return zlib.crc32(values.tobytes())
+
+def _pack_string(text):
+    data = text.encode("utf-8")
+    return struct.pack("<H", len(data)) + data
+
+def _unpack_string(data, offset):
+    length, = struct.unpack_from("<H", data, offset)
+    offset += 2
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+def script_name(path):
+    # Scripts next to game.py are stored relative to it, so replays work on other computers
+    if not path:
+        return ""
+    path = os.path.abspath(path)
+    if os.path.dirname(path) == ROOT:
+        return os.path.basename(path)
+    return path
+
+@dataclass
+class Replay():
+
+    seed: int
+    player: str = "" # Participant script of player 1
+    enemy: str = "" # Participant script of the enemy, empty for the enemy of the player's script
+    controllers: int = 0
+    ticks: int = 0
+    end_game: int = 0
+    checksum: int = 0
+    inputs: bytes = b"" # (controllers + 1)//2 bytes per tick, two controllers per byte
+    keyframes: dict = field(default_factory = dict) # tick -> library.snapshot.dumps() at the start of the tick
+
+    @property
+    def tick_size(self):
+        return (self.controllers + 1)//2
+
+    def controls(self, tick):
+        start = tick*self.tick_size
+        bits = []
+        for byte in self.inputs[start:start + self.tick_size]:
+            bits.append(byte & 15)
+            bits.append(byte >> 4)
+        return bits[:self.controllers]
+
+    def to_bytes(self):
+        inputs = zlib.compress(self.inputs, 9)
+        data = [HEADER.pack(MAGIC, VERSION, self.controllers, self.ticks, self.end_game, self.checksum),
+                _pack_string(str(self.seed)), _pack_string(self.player), _pack_string(self.enemy),
+                struct.pack("<I", len(inputs)), inputs, struct.pack("<I", len(self.keyframes))]
+        for tick, keyframe in sorted(self.keyframes.items()):
+            data.append(struct.pack("<II", tick, len(keyframe)))
+            data.append(keyframe)
+        return b"".join(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, controllers, ticks, end_game, checksum = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a replay file of this version of the game")
+        offset = HEADER.size
+        seed, offset = _unpack_string(data, offset)
+        player, offset = _unpack_string(data, offset)
+        enemy, offset = _unpack_string(data, offset)
+        length, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        inputs = zlib.decompress(data[offset:offset + length])
+        offset += length
+        count, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        keyframes = {}
+        for _ in range(count):
+            tick, length = struct.unpack_from("<II", data, offset)
+            offset += 8
+            keyframes[tick] = data[offset:offset + length]
+            offset += length
+        return cls(int(seed), player, enemy, controllers, ticks, end_game, checksum, inputs, keyframes)
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+    def simulation(self):
+        # A simulation set up like the recorded match, with the controls coming from the replay
+        from library.simulation import Simulation, load_blueprint
+        script = self._script_path(self.player)
+        if self.enemy:
+            return Simulation(load_blueprint(script), load_blueprint(self._script_path(self.enemy)),
+                              seed = self.seed, replay = ReplayPlayer(self))
+        return Simulation(script = script, seed = self.seed, replay = ReplayPlayer(self))
+
+    def _script_path(self, name):
+        if not name:
+            return None
+        return name if os.path.isabs(name) else os.path.join(ROOT, name)
+
+class Recorder():
+    # Called by game.update_controls() every tick, after the pilots and players decided.
+    # Without a seed the recorder takes the one the random streams were seeded with.
+
+    def __init__(self, seed = None, player = None, enemy = None):
+        self.replay = Replay(seed, script_name(player), script_name(enemy))
+        self._inputs = bytearray()
+        self._controllers = None
+
+    def update(self):
+        if self._controllers is None:
+            from library.rng import rng
+            if self.replay.seed is None:
+                self.replay.seed = rng.master_seed
+            self._controllers = controllers()
+            self.replay.controllers = len(self._controllers)
+        bits = [control_bits(control) for control in self._controllers] + [0]
+        self._inputs.extend([bits[i] | (bits[i + 1] << 4) for i in range(0, len(self._controllers), 2)])
+        self.replay.ticks += 1
+
+    def restart(self, tick):
+        # A snapshot was restored, the recording goes on from its tick
+        if self._controllers is not None:
+            del self._inputs[tick*self.replay.tick_size:]
+            self._controllers = None
+        self.replay.ticks = tick
+
+    def finish(self):
+        from library.utils import world
+        self.replay.inputs = bytes(self._inputs)
+        self.replay.end_game = world.end_game
+        self.replay.checksum = world_checksum()
+        return self.replay
+
+    def save(self, path = None):
+        if self.replay.ticks == 0:
+            return None
+        if path is None:
+            os.makedirs(REPLAYS_FOLDER, exist_ok = True)
+            name = os.path.splitext(os.path.basename(self.replay.player or "game"))[0]
+            path = os.path.join(REPLAYS_FOLDER, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{self.replay.seed}.replay")
+        self.finish().save(path)
+        return path
+
+class ReplayPlayer():
+    # Takes the place of the recorder in game.update_controls(), overriding whatever
+    # the pilots and the keyboard decided with the recorded controls
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.tick = 0
+        self._controllers = None
+
+    @property
+    def finished(self):
+        return self.tick >= self.replay.ticks
+
+    def restart(self, tick):
+        # After a keyframe was restored the spaceships have new controls
+        self.tick = tick
+        self._controllers = None
+
+    def update(self):
+        if self._controllers is None:
+            self._controllers = controllers()
+            if len(self._controllers) != self.replay.controllers:
+                raise ValueError(f"The replay has {self.replay.controllers} spaceships, the match has {len(self._controllers)}")
+        if not self.finished:
+            for control, bits in zip(self._controllers, self.replay.controls(self.tick)):
+                set_control_bits(control, bits)
+        self.tick += 1
+
+def play(replay):
+    # Re-simulates the whole replay, returns the simulation at its last tick
+    simulation = replay.simulation()
+    while not simulation.replay.finished:
+        simulation.step()
+    return simulation
+
+class ReplaySeeker():
+    # Moves a re-simulation of the replay to any tick. Besides the keyframes of the
+    # file, a keyframe is kept every keyframe_interval ticks the first time they are
+    # played, so going back to a moment already seen is fast even without them.
+    # Those keyframes are in memory snapshots, unless in_memory is False (keyframes for files).
+
+    def __init__(self, replay, keyframe_interval = None, in_memory = True):
+        self.in_memory = in_memory
+        self.simulation = replay.simulation() # Imports the game, headless unless a window is open
+        from library import snapshot
+        from library.globals import FPS
+        self._snapshot = snapshot
+        self.replay = replay
+        self.keyframes = dict(replay.keyframes)
+        self.keyframe_interval = KEYFRAME_SECONDS*FPS if keyframe_interval is None else keyframe_interval
+
+    @property
+    def tick(self):
+        return self.simulation.tick
+
+    def step(self):
+        if self.tick >= self.replay.ticks:
+            return
+        if self.keyframe_interval and self.tick % self.keyframe_interval == 0 and self.tick not in self.keyframes:
+            self.keyframes[self.tick] = self.simulation.snapshot() if self.in_memory else self._snapshot.dumps()
+        self.simulation.step()
+
+    def seek(self, tick):
+        tick = max(0, min(tick, self.replay.ticks))
+        keyframe = max([k for k in self.keyframes if k <= tick], default = None)
+        if tick < self.tick or (keyframe is not None and keyframe > self.tick):
+            if keyframe is None:
+                self.simulation = self.replay.simulation()
+            else:
+                self._restore(keyframe)
+        while self.tick < tick:
+            self.step()
+
+    def _restore(self, tick):
+        keyframe = self.keyframes[tick]
+        if isinstance(keyframe, bytes): # From the file
+            self._snapshot.loads(keyframe)
+            self.simulation.restored(tick)
+        else:
+            self.simulation.restore(keyframe)
+
+def add_keyframes(replay, seconds = KEYFRAME_SECONDS):
+    # Plays the replay once and keeps a keyframe every few seconds, returns if it ended like the recording
+    replay.keyframes = {}
+    seeker = ReplaySeeker(replay, 0, in_memory = False)
+    from library.globals import FPS
+    from library.utils import world
+    seeker.keyframe_interval = round(seconds*FPS)
+    seeker.seek(replay.ticks)
+    replay.keyframes = seeker.keyframes
+    return world.end_game == replay.end_game and world_checksum() == replay.checksum
+
+def watch(replay, title = "Replay"):
+    # Shows the replay in a window. SPACE pauses, LEFT and RIGHT jump 5 seconds,
+    # 1, 2, 4 and 8 set the speed, clicking or dragging on the timeline jumps there.
+    sys._pgzrun = True
+    from types import ModuleType
+    from pgzero.runner import prepare_mod, run_mod
+    viewer = ModuleType("replay_viewer")
+    viewer.__file__ = os.path.join(ROOT, "game.py")
+    prepare_mod(viewer)
+
+    import game
+    game.headless = True # Loading the participant scripts must not start another game
+    from pgzero import game as pgzero_game
+    from pgzero.keyboard import keys
+    from library.globals import WIDTH, HEIGHT, FPS
+
+    seeker = ReplaySeeker(replay)
+    state = {"speed": 1, "paused": False}
+    timeline = (10, HEIGHT - 8, WIDTH - 20, 4) # x, y, width, height
+
+    def seek_to_mouse(pos):
+        if pos[1] < timeline[1] - 12:
+            return
+        x = min(max(pos[0] - timeline[0], 0), timeline[2])
+        seeker.seek(round(x/timeline[2]*replay.ticks))
+
+    def update():
+        if not state["paused"]:
+            for _ in range(state["speed"]):
+                seeker.step()
+
+    def draw():
+        game.draw()
+        screen = pgzero_game.screen
+        x, y, width, height = timeline
+        screen.fill((60, 60, 60), (x, y, width, height))
+        screen.fill((220, 220, 220), (x, y, width*seeker.tick/max(replay.ticks, 1), height))
+        for tick in seeker.keyframes:
+            screen.fill((200, 178, 52), (x + width*tick/max(replay.ticks, 1), y - 2, 1, height + 4))
+        status = f"{seeker.tick/FPS:6.1f}s / {replay.ticks/FPS:.1f}s  {state['speed']}x{'  paused' if state['paused'] else ''}"
+        viewer.screen.draw.text(status, bottomright = (WIDTH - 10, HEIGHT - 14), fontsize = 20)
+
+    def on_key_down(key):
+        if key == keys.SPACE:
+            state["paused"] = not state["paused"]
+        elif key == keys.LEFT:
+            seeker.seek(seeker.tick - 5*FPS)
+        elif key == keys.RIGHT:
+            seeker.seek(seeker.tick + 5*FPS)
+        elif key == keys.HOME:
+            seeker.seek(0)
+        elif key == keys.END:
+            seeker.seek(replay.ticks - 10*FPS)
+        elif key in (keys.K_1, keys.K_2, keys.K_4, keys.K_8):
+            state["speed"] = SPEEDS[(keys.K_1, keys.K_2, keys.K_4, keys.K_8).index(key)]
+        elif key == keys.ESCAPE:
+            sys.exit(0)
+
+    def on_mouse_down(pos):
+        seek_to_mouse(pos)
+
+    def on_mouse_move(pos, buttons):
+        if buttons:
+            seek_to_mouse(pos)
+
+    viewer.__dict__.update(WIDTH = WIDTH, HEIGHT = HEIGHT, TITLE = title, update = update, draw = draw,
+                           on_key_down = on_key_down, on_mouse_down = on_mouse_down, on_mouse_move = on_mouse_move)
+    run_mod(viewer)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Play a replay again and check that it ends exactly the same.")
+    parser.add_argument("replay", help = "replay file")
+    parser.add_argument("--watch", action = "store_true", help = "show the replay in a window")
+    parser.add_argument("--keyframes", type = float, metavar = "SECONDS",
+                        help = f"add a keyframe every SECONDS (e.g. {KEYFRAME_SECONDS}) to the file for fast jumps, 0 removes them")
+    parser.add_argument("--seek", type = float, metavar = "SECONDS", help = "only simulate until SECONDS into the match")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.replay)
+    if args.watch:
+        watch(replay, os.path.basename(args.replay))
+        return
+
+    outcomes = {1: "won", -1: "lost", 0: "no winner"}
+    print(f"{args.replay}: {replay.player or 'default spaceship'}"
+          f"{' vs ' + replay.enemy if replay.enemy else ''}, seed {replay.seed}, {replay.ticks} ticks, "
+          f"{outcomes[replay.end_game]}")
+
+    if args.keyframes is not None:
+        start = time.perf_counter()
+        exact = add_keyframes(replay, args.keyframes) if args.keyframes > 0 else True
+        if args.keyframes <= 0:
+            replay.keyframes = {}
+        if not exact:
+            sys.exit("The replay did not end like the recording, the keyframes were not saved")
+        replay.save(args.replay)
+        print(f"Saved {len(replay.keyframes)} keyframes in {time.perf_counter() - start:.2f}s, "
+              f"the file is {os.path.getsize(args.replay)//1024} KB")
+        return
+
+    if args.seek is not None:
+        start = time.perf_counter()
+        seeker = ReplaySeeker(replay, keyframe_interval = 0)
+        from library.globals import FPS
+        from library.utils import world
+        seeker.seek(round(args.seek*FPS))
+        print(f"Reached tick {seeker.tick} in {(time.perf_counter() - start)*1000:.0f}ms "
+              f"({len(replay.keyframes)} keyframes in the file), {len(world.objects)} objects")
+        return
+
+    start = time.perf_counter()
+    simulation = play(replay)
+    seconds = time.perf_counter() - start
+    from library.utils import world
+    exact = world.end_game == replay.end_game and world_checksum() == replay.checksum
+    print(f"Re-simulated in {seconds:.2f}s: {outcomes[world.end_game]}, "
+          f"{'identical to the recording' if exact else 'DIFFERENT from the recording'}")
+    if not exact:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
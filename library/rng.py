@@ -0,0 +1,32 @@
+import zlib
+import random
+import numpy
+
+from library.globals import SEED
+
+# Every part of the game that needs random numbers draws them from its own stream.
+# All the streams come from one seed, so the same seed (and the same inputs) plays
+# the same match again (see library.replay). A stream drawing more or fewer numbers,
+# for example because an ability was used, does not change what the others draw.
+
+STREAMS = ["environment", "asteroids", "powerups", "pilots", "laboratory", "weapons"]
+
+class RandomStreams():
+
+    def __init__(self, seed = None):
+        for name in STREAMS:
+            setattr(self, name, random.Random())
+        self.seed(seed)
+
+    def seed(self, seed = None):
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**32)
+        self.master_seed = seed
+        for name in STREAMS:
+            getattr(self, name).seed(f"{seed}:{name}")
+
+        # Participant scripts use the random modules directly
+        random.seed(f"{seed}:participants")
+        numpy.random.seed(zlib.crc32(f"{seed}:participants".encode()))
+
+rng = RandomStreams(SEED)
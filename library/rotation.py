@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+import pygame
+from pgzero.actor import transform_anchor
+
+from library.globals import ROTATION_STEP, ROTATION_CACHE_SIZE
+
+# Rotating a surface is one of the most expensive things an object does, and the
+# same few angles come up again and again (projectiles of the same weapon,
+# spaceships turning around, bounces). The rotation cache keeps the rotated
+# surfaces by source surface (every image name loads to one surface) and angle,
+# rounded to ROTATION_STEP degrees. The least recently used ones are dropped when
+# they take more than ROTATION_CACHE_SIZE megabytes.
+
+class RotationCache():
+
+    def __init__(self, step = ROTATION_STEP, size = ROTATION_CACHE_SIZE):
+        self.step = step
+        self.size = size*1024*1024 # Bytes
+        self.bytes = 0
+        self._surfaces = OrderedDict() # (surface, angle) -> rotated surface
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def quantize(self, angle):
+        if self.step:
+            angle = round(angle/self.step)*self.step
+        return angle % 360
+
+    def rotate(self, surface, angle):
+        # Returns the rotated surface and the angle it was rotated by
+        angle = self.quantize(angle)
+        if angle == 0:
+            return surface, 0
+        key = (surface, angle)
+        rotated = self._surfaces.get(key)
+        if rotated is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return rotated, angle
+
+        self.misses += 1
+        rotated = pygame.transform.rotate(surface, angle)
+        self._surfaces[key] = rotated
+        self.bytes += _bytes(rotated)
+        while self.bytes > self.size and len(self._surfaces) > 1:
+            key, old = self._surfaces.popitem(last = False)
+            self.bytes -= _bytes(old)
+            self.evicted += 1
+        return rotated, angle
+
+    def rotate_actor(self, actor, angle):
+        # What pgzero's Actor.angle does, with the cached surface
+        actor._angle = angle
+        actor._surf, angle = self.rotate(actor._orig_surf, angle)
+        pos = actor.pos
+        actor.width, actor.height = actor._surf.get_size()
+        width, height = actor._orig_surf.get_size()
+        ax, ay = actor._untransformed_anchor
+        actor._anchor = transform_anchor(ax, ay, width, height, angle)
+        actor.pos = pos
+
+    def clear(self):
+        self._surfaces.clear()
+        self.bytes = 0
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+        return {"surfaces" : len(self._surfaces),
+                "megabytes" : self.bytes/(1024*1024),
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "evicted" : self.evicted,
+                "hit_rate" : self.hits/lookups if lookups else 0}
+
+def _bytes(surface):
+    return surface.get_width()*surface.get_height()*surface.get_bytesize()
+
+rotation_cache = RotationCache()
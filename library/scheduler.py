@@ -0,0 +1,68 @@
+import math
+
+from library.globals import FPS
+
+# Timers of the game (object timespans, weapon reloads, ability resets) are
+# counted in frames instead of wall clock time, so they behave the same when
+# the game runs faster than real time. They are kept in a timing wheel: a ring
+# of WHEEL_SIZE buckets, one per frame. Scheduling puts the callback in the
+# bucket of the frame it is due and advance() only visits the bucket of the
+# current frame, so both cost O(1) no matter how many timers are waiting.
+# Delays longer than the wheel stay in their bucket for another lap.
+
+WHEEL_SIZE = 2048
+
+class TimingWheel():
+
+    def __init__(self, size = WHEEL_SIZE):
+        self.size = size
+        self.tick = 0
+        self._buckets = [[] for i in range(size)]
+        self._due = {} # callback -> the frame it fires, entries in the buckets with another frame are cancelled
+
+    def frames(self, seconds):
+        # Same rounding as a clock checked once per frame: fire on the first frame at or after the delay
+        return max(1, math.ceil(seconds*FPS - 1e-9))
+
+    def schedule_unique(self, callback, delay):
+        # Call callback once, delay seconds from now. If it was already scheduled its timer restarts.
+        self.schedule_unique_frames(callback, self.frames(delay))
+
+    def schedule_unique_frames(self, callback, frames):
+        due = self.tick + max(1, frames)
+        self._due[callback] = due
+        self._buckets[due % self.size].append((due, callback))
+
+    def unschedule(self, callback):
+        self._due.pop(callback, None)
+
+    def is_scheduled(self, callback):
+        return callback in self._due
+
+    def advance(self):
+        # Moves one frame forward and calls every callback due in this frame
+        self.tick += 1
+        bucket = self._buckets[self.tick % self.size]
+        if not bucket:
+            return
+        fired = []
+        waiting = []
+        due_frames = self._due
+        for entry in bucket:
+            due, callback = entry
+            if due == self.tick:
+                if due_frames.get(callback) == due:
+                    del due_frames[callback]
+                    fired.append(callback)
+            elif due_frames.get(callback) == due:
+                waiting.append(entry)
+        self._buckets[self.tick % self.size] = waiting
+        for callback in fired:
+            callback()
+
+    def clear(self):
+        self.tick = 0
+        self._buckets = [[] for i in range(self.size)]
+        self._due = {}
+
+scheduler = TimingWheel()
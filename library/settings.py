@@ -7,9 +7,31 @@ fullscreen = False  #if the game should start fullscreen or not
 show_controls        = True  #show the player's controls on start
 two_players          = False
 number_of_enemies    = 1
-objects_limit        = 80    #maximum amount of objects in the game per frame
+objects_limit        = 80    #maximum amount of objects in the game, spaceships always fit
+projectiles_limit    = 60    #maximum amount of projectiles, the oldest projectile disappears when a new one is shot
+asteroids_limit      = 20    #maximum amount of asteroids, no new asteroids appear while there are that many
+powerups_limit       = 5     #maximum amount of powerups, no new powerups appear while there are that many
 asteroids_speed      = 1     #how fast asteroids travel in pixels per frame
 asteroids_per_second = 0.4   #how many asteroids are created per second on average
 asteroids_damage     = 10    #the maximum damage inflicted on the player that collides with an asteroid
 powerups_per_second  = 0.03  #how many powerups are created per second on average
+seed                 = None  #number that decides all the random events of a game, None picks a new one every game
+record_replays       = True  #save a replay of every game in the replays folder
 
+# Performance Settings
+collision_backend    = "grid" #how objects that may collide are found: "grid" (spatial hash), "sweep" (sweep and prune) or "none" (check every pair)
+collision_cell_size  = 64     #size of the grid cells in pixels when collision_backend is "grid"
+projectile_pool_size = 512    #how many unused projectiles are kept to be recycled
+effect_pool_size     = 128    #how many unused effects (explosions) are kept to be recycled
+asteroid_pool_size   = 32     #how many unused asteroids are kept to be recycled
+rotation_step        = 1      #angles of rotated images are rounded to this many degrees, so the rotated images can be reused
+rotation_cache_size  = 32     #megabytes of rotated images kept for reuse
+batch_hud_bars       = True   #draw the health and ability bars from shared pre-rendered strips with one blit
+texture_atlas        = True   #load the images from one cache file of converted pixels (made again when an image changes)
+batch_sprites        = True   #draw all the objects, bars and effects of a frame with one blit call
+dirty_rects          = False  #only draw the background again and update the window where something moved (faster on slow computers)
+text_cache_size      = 64     #messages kept rendered for the texts on screen (typing and fading reuse the rendered message)
+batch_pilots         = False  #the enemy pilots decide all together with numpy, faster with many enemies
+pilot_decision_ticks = 1      #when batch_pilots is on, the enemy pilots decide every this many frames and keep their controls in between
+profiler             = False  #time every phase of every frame from the start (F3 shows the timings, F4 saves a trace)
+profiler_frames      = 300    #how many of the last frames the profiler keeps for its graph and traces
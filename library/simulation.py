@@ -0,0 +1,235 @@
+import os
+import sys
+import time
+import argparse
+import importlib.util
+from dataclasses import dataclass, replace
+
+# Running a simulation does not need a window. If the game has not been imported yet
+# (python -m library.simulation, tournaments, benchmarks) pygame is switched to its
+# dummy drivers before pgzero gets the chance to open a display.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+HEADLESS = "game" not in sys.modules
+if HEADLESS:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+    # Do what pgzrun does on import, without requiring __main__ to be a file.
+    # With sys._pgzrun set, pgzrun leaves __main__ alone and pgzrun.go() returns at once.
+    sys._pgzrun = True
+    from library.startup import import_pygame
+    import_pygame()
+    import pygame
+    import pgzero.runner
+    from pgzero import loaders
+    loaders.set_root(os.path.join(ROOT, "game.py"))
+    pygame.display.set_mode((1, 1))
+
+import game
+game.headless = game.headless or HEADLESS
+
+from pgzero.clock import clock
+
+from library.laboratory import create_enemies, create_player2, automatic
+from library.spaceship import Spaceship, spaceship_from_blueprint, default_update
+from library.blueprints import SpaceshipBlueprint
+from library.pilot import Pilot
+from library.utils import world
+from library.entities import clear_stores
+from library.pool import pool_statistics
+from library.rotation import rotation_cache
+from library.scheduler import scheduler
+from library.broadphase import broadphase
+from library.rng import rng
+from library.replay import Recorder
+from library import snapshot
+from library.profiler import profiler
+from library.globals import FPS, Team, Type, NUMBER_OF_ENEMIES, IMAGES_SPACESHIPS
+
+MAX_TICKS = 10*60*FPS # A 10 minutes match
+
+@dataclass
+class MatchResult():
+
+    end_game: int = 0 # 1 the player won, -1 the player lost, 0 no winner until the ticks limit
+    ticks: int = 0
+    player_health: float = 0
+    enemy_health: float = 0
+    seconds: float = 0
+    timed_out: bool = False # The match was stopped by the time limit of run()
+
+    @property
+    def ticks_per_second(self):
+        return self.ticks/self.seconds if self.seconds > 0 else 0
+
+class Simulation():
+
+    def __init__(self, player: SpaceshipBlueprint = None, enemy: SpaceshipBlueprint = None, seed = None, script = None, replay = None,
+                 enemies = NUMBER_OF_ENEMIES):
+        # With a script the match is set up exactly like game.play() does for that script
+        # replay is a library.replay Recorder or ReplayPlayer
+        self.player = player
+        self.enemy = enemy
+        self.seed = seed
+        self.script = script
+        self.replay = replay
+        self.enemies = enemies # The enemy blueprint flies the first one, the others come from the laboratory
+
+        # The parts of a tick in order (library.benchmark times each one)
+        self.phases = [("timers", self._update_timers),
+                       ("pilots", self._update_pilots),
+                       ("environment", game.update_enviroment),
+                       ("objects", game.update_objects),
+                       ("gui", game.update_gui),
+                       ("effects", game.update_effects)]
+        self.reset()
+
+    def reset(self):
+        clock.events.clear()
+        scheduler.clear()
+        world.clear()
+        clear_stores()
+        broadphase.clear()
+        rng.seed(self.seed)
+        create_enemies(self.enemies)
+        create_player2()
+        game.replay = self.replay
+
+        if self.script:
+            module = load_script(self.script)
+            player1spaceship = game.create_player_spaceship(module)
+            enemy_spaceship = module.enemy if hasattr(module, "enemy") else None
+        else:
+            if self.player:
+                player1spaceship = spaceship_from_blueprint(self.player, Team.PLAYER)
+            else:
+                player1spaceship = default_player()
+            enemy_spaceship = spaceship_from_blueprint(self.enemy, Team.ENEMY) if self.enemy else None
+        game.start_match(player1spaceship, enemy_spaceship)
+
+        # Nobody is at the keyboard, the player's spaceship is flown by a pilot too
+        self.player_pilot = Pilot("Player1")
+        self.player_pilot.take_control(world.player1)
+        self.tick = 0
+
+    def _target(self):
+        for enemy in world.find(Team.ENEMY, Type.SPACESHIP):
+            if enemy.alive:
+                return enemy
+        return world.enemy_spaceships[0]
+
+    def _update_timers(self):
+        clock.tick(1/FPS) # Only for timers of participant scripts, the game uses the scheduler
+        scheduler.advance()
+
+    def _update_pilots(self):
+        game.update_pilots()
+        self.player_pilot.think([self._target()])
+        game.update_controls()
+
+    def step(self):
+        profiler.next_frame()
+        for name, phase in self.phases:
+            phase()
+        self.tick += 1
+
+    def snapshot(self):
+        # The whole state of the match, restore() goes back to it as many times as needed
+        return snapshot.snapshot([self.player_pilot])
+
+    def restore(self, state):
+        snapshot.restore(state)
+        self.restored(state.tick)
+
+    def restored(self, tick):
+        # The state of the match was put back (by restore() or library.snapshot.loads())
+        self.tick = tick
+        self.player_pilot = world.player1.control
+        if self.replay:
+            self.replay.restart(tick)
+
+    def run(self, max_ticks = MAX_TICKS, time_limit = None):
+        # time_limit (seconds of wall clock) stops matches with slow update functions
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit else None
+        timed_out = False
+        while self.tick < max_ticks and world.end_game == 0:
+            self.step()
+            if deadline and self.tick % FPS == 0 and time.perf_counter() > deadline:
+                timed_out = True
+                break
+        return self.result(time.perf_counter() - start, timed_out)
+
+    def result(self, seconds = 0, timed_out = False):
+        return MatchResult(end_game = world.end_game,
+                           ticks = self.tick,
+                           player_health = world.player1.health,
+                           enemy_health = world.enemy_health,
+                           seconds = seconds,
+                           timed_out = timed_out)
+
+def default_player():
+    # Without a script or a blueprint the player's side is a spaceship like the laboratory enemies, flown by the pilot
+    return Spaceship(image = IMAGES_SPACESHIPS[0], health = 50, speed = 4, ability_function = None, ability_duration = 6,
+                     cooldown_duration = 6, weapon = automatic, update_function = default_update, team = Team.PLAYER)
+
+def load_script(path):
+    # Participant scripts call game.play() at the end, which does nothing while headless
+    name = "participant_" + os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module # Functions of the script can then be found by name (library.snapshot)
+    spec.loader.exec_module(module)
+    return module
+
+def load_blueprint(path):
+    spaceship = game.create_player_spaceship(load_script(path))
+    return replace(spaceship._blueprint, update_function = spaceship._update_function, team = Team.PLAYER)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Run matches without a window, as fast as the CPU allows.")
+    parser.add_argument("script", nargs = "?", help = "participant script that defines the player's spaceship")
+    parser.add_argument("--enemy", help = "participant script that defines the enemy's spaceship")
+    parser.add_argument("--ticks", type = int, default = MAX_TICKS, help = f"maximum ticks per match (default {MAX_TICKS})")
+    parser.add_argument("--matches", type = int, default = 1, help = "number of matches to run")
+    parser.add_argument("--seed", type = int, help = "seed of the first match, the next matches use the next numbers")
+    parser.add_argument("--record", action = "store_true", help = "save a replay of every match in the replays folder")
+    parser.add_argument("--trace", metavar = "FILE", help = "save a profiler trace of the last ticks of the last match")
+    parser.add_argument("--pools", action = "store_true", help = "print the object pool and rotation cache statistics at the end")
+    args = parser.parse_args(argv)
+
+    # Without --enemy the enemy is the one of the script, like in the game window
+    player = load_blueprint(args.script) if args.script and args.enemy else None
+    enemy = load_blueprint(args.enemy) if args.enemy else None
+    script = args.script if not args.enemy else None
+
+    outcomes = {1: "won", -1: "lost", 0: "no winner"}
+    profiler.recording = profiler.recording or bool(args.trace)
+    for match in range(args.matches):
+        seed = args.seed + match if args.seed is not None else None
+        recorder = Recorder(seed, args.script, args.enemy) if args.record else None
+        result = Simulation(player, enemy, seed, script, recorder).run(args.ticks)
+        print(f"Match {match + 1}: {outcomes[result.end_game]} after {result.ticks} ticks, "
+              f"health {result.player_health:g} vs {result.enemy_health:g} "
+              f"({result.ticks_per_second:.0f} ticks/s, seed {rng.master_seed})")
+        if recorder:
+            print(f"Replay saved to {recorder.save()}")
+
+    if args.trace:
+        profiler.next_frame() # Keeps the last tick
+        print(f"Profiler trace of {len(profiler.frames)} ticks saved to {profiler.save_trace(args.trace)}")
+
+    if args.pools:
+        for name, statistics in pool_statistics().items():
+            print(f"Pool {name}: {statistics['hits']} recycled, {statistics['misses']} created, "
+                  f"{statistics['dropped']} dropped, hit rate {statistics['hit_rate']:.0%}")
+        statistics = rotation_cache.statistics()
+        print(f"Rotation cache: {statistics['surfaces']} surfaces ({statistics['megabytes']:.1f} MB), {statistics['hits']} hits, "
+              f"{statistics['misses']} misses, {statistics['evicted']} evicted, hit rate {statistics['hit_rate']:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import sys
+import pickle
+import random
+import types
+import zlib
+import io
+
+from enum import Enum
+from itertools import compress
+
+import numpy
+import pygame
+from pgzero import loaders
+from pgzero.rect import ZRect
+
+import game
+from library.utils import world
+from library.entities import stores
+from library.scheduler import scheduler
+from library.broadphase import broadphase
+from library.laboratory import pilots, player2
+from library.pool import pools
+from library.rotation import rotation_cache
+from library.rng import rng, STREAMS
+from library.globals import EXPLOSION_FRAMES
+
+# The whole state of a match can be captured and put back: the objects, effects
+# and guis of the world, the entity stores, the scheduled timers, the collision
+# grid, the pilots, the random streams and the plain variables of the participant
+# scripts. The restored match continues exactly like the original one would have.
+#
+# snapshot() and restore() keep the state in memory, for trying things out from
+# the same moment again and again (AI lookahead, "what if" questions). They keep
+# the same objects: restore() puts their attributes back, so references to a
+# spaceship stay valid. Restoring only copies the lists and dicts again and puts
+# the rects back in place. Taking a snapshot walks every object the match refers
+# to (weapons, pilots, blueprints and pooled instances too) and reads the random
+# streams: for a duel it takes about 0.7 ms and restoring it 0.2 ms, with 30
+# enemies 2.5 ms and 0.6 ms.
+#
+# dumps() and loads() store the state as bytes instead (the keyframes of
+# library.replay), loads() creates new objects. Surfaces are not stored. Images
+# are stored by their name and rotated or drawn surfaces are made again after
+# loading. Functions are stored by their module and name, so the participant
+# scripts of the match must be loaded (by a Simulation of the same match) before
+# loads() is called.
+
+PARTICIPANT_VALUES = (int, float, bool, str, list, dict, tuple, set)
+COLUMNS = ["x", "y", "vx", "vy", "health", "team", "lifetime", "alive"]
+
+def _images():
+    return {id(surface): key[0] for key, surface in loaders.images.cache.items() if not key[1] and not key[2]}
+
+class _Pickler(pickle.Pickler):
+
+    def __init__(self, file):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._images = _images()
+        self._controllers = {id(game.player1): "player1", id(player2): "player2"}
+
+    def persistent_id(self, obj):
+        if obj is world:
+            return ("world",) # Referred to by the budget, the world stays the same object
+        if isinstance(obj, pygame.Surface):
+            return ("image", self._images.get(id(obj)))
+        if id(obj) in self._controllers and obj is not None:
+            # Module level controllers stay the same objects, only their state is stored
+            return ("controller", self._controllers[id(obj)])
+        if isinstance(obj, types.FunctionType) and "<" in obj.__qualname__:
+            # Lambdas and nested functions cannot be found by name, their code is looked up instead
+            if obj.__closure__:
+                raise pickle.PicklingError(f"Cannot store the function {obj.__qualname__}, it uses variables of its enclosing function")
+            return ("code", obj.__module__, obj.__code__.co_name, obj.__code__.co_firstlineno)
+        return None
+
+# Keyframes come in replay files from other people, loading one must not run code
+# the file brings along. Only the classes and functions defined in the modules of
+# the game (and in the participant scripts, which the replay runs anyway) and the
+# few others the state needs can be loaded.
+GAME_MODULES = {"game", "library.asteroid", "library.blueprints", "library.budget", "library.effects", "library.entities",
+                "library.globals", "library.gui", "library.laboratory", "library.pilot", "library.powerups",
+                "library.projectile", "library.reflector", "library.spaceship", "library.utils", "library.weapon"}
+
+def _game_module(name):
+    return name in GAME_MODULES or name.startswith("participant_")
+
+def _getattr(obj, name):
+    # Bound methods (the timers of the scheduler) are stored as getattr(object, name)
+    if name.startswith("__"):
+        raise pickle.UnpicklingError(f"Keyframes cannot refer to {name}")
+    return getattr(obj, name)
+
+ALLOWED_GLOBALS = {("numpy", "dtype"), ("numpy._core.numeric", "_frombuffer"), ("numpy.core.numeric", "_frombuffer"),
+                   ("pygame", "__color_constructor"), ("pgzero.rect", "ZRect")}
+
+class _Unpickler(pickle.Unpickler):
+
+    def find_class(self, module, name):
+        if (module, name) == ("builtins", "getattr"):
+            return _getattr
+        if (module, name) in ALLOWED_GLOBALS and module in sys.modules:
+            return getattr(sys.modules[module], name)
+        if _game_module(module) and module in sys.modules:
+            obj = getattr(sys.modules[module], name, None)
+            if isinstance(obj, (type, types.FunctionType)) and obj.__module__ == module:
+                return obj
+        raise pickle.UnpicklingError(f"Keyframes cannot contain {module}.{name}")
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind == "world":
+            return world
+        if kind == "image":
+            return loaders.images.load(pid[1]) if pid[1] else None
+        if kind == "controller":
+            return game.player1 if pid[1] == "player1" else player2
+        if kind == "code":
+            if not _game_module(pid[1]) or pid[1] not in sys.modules:
+                raise pickle.UnpicklingError(f"Keyframes cannot contain functions of {pid[1]}")
+            module = sys.modules[pid[1]]
+            code = _find_code(module, pid[2], pid[3])
+            if code is None:
+                raise pickle.UnpicklingError(f"Cannot find the function {pid[2]} of line {pid[3]} in {pid[1]}")
+            return types.FunctionType(code, module.__dict__)
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid}")
+
+_module_code = {}
+
+def _find_code(module, name, line):
+    # Searches the compiled code of the module, lambdas can be anywhere in it
+    code = _module_code.get(module.__name__)
+    if code is None:
+        code = _module_code[module.__name__] = module.__spec__.loader.get_code(module.__name__)
+    pending = [code]
+    while pending:
+        code = pending.pop()
+        if code.co_name == name and code.co_firstlineno == line:
+            return code
+        pending.extend([c for c in code.co_consts if isinstance(c, types.CodeType)])
+    return None
+
+def _participants():
+    return {name: module for name, module in sys.modules.items() if name.startswith("participant_")}
+
+def _store_state(store):
+    # Only the used part of the columns
+    state = dict(store.__dict__)
+    for name in COLUMNS:
+        state[name] = state[name][:store.count].copy()
+    return state
+
+def _set_store_state(store, state):
+    for name in COLUMNS:
+        column = numpy.zeros(state["capacity"], dtype = state[name].dtype)
+        column[:state["count"]] = state[name]
+        state[name] = column
+    store.__dict__.update(state)
+
+def dumps():
+    state = {
+        "world": world.__dict__,
+        "stores": [_store_state(store) for store in stores],
+        "scheduler": scheduler.__dict__,
+        "broadphase": broadphase.__dict__,
+        "pilots": list(pilots),
+        "controllers": {"player1": dict(game.player1.__dict__), "player2": dict(player2.__dict__) if player2 else None},
+        "rng": {"streams": {name: getattr(rng, name).getstate() for name in STREAMS},
+                "master_seed": rng.master_seed,
+                "random": random.getstate(),
+                "numpy": numpy.random.get_state()},
+        "participants": {name: {key: value for key, value in vars(module).items()
+                                if type(value) in PARTICIPANT_VALUES and not key.startswith("__")}
+                         for name, module in _participants().items()},
+    }
+    file = io.BytesIO()
+    _Pickler(file).dump(state)
+    return zlib.compress(file.getvalue())
+
+def loads(data):
+    state = _Unpickler(io.BytesIO(zlib.decompress(data))).load()
+
+    world.__dict__.update(state["world"])
+    for store, store_state in zip(stores, state["stores"]):
+        _set_store_state(store, store_state)
+    scheduler.__dict__.update(state["scheduler"])
+    broadphase.__dict__.update(state["broadphase"])
+    pilots[:] = state["pilots"]
+    game.player1.__dict__.update(state["controllers"]["player1"])
+    if player2:
+        player2.__dict__.update(state["controllers"]["player2"])
+
+    for name in STREAMS:
+        getattr(rng, name).setstate(state["rng"]["streams"][name])
+    rng.master_seed = state["rng"]["master_seed"]
+    random.setstate(state["rng"]["random"])
+    numpy.random.set_state(state["rng"]["numpy"])
+
+    participants = _participants()
+    for name, values in state["participants"].items():
+        if name in participants:
+            vars(participants[name]).update(values)
+
+    _restore_surfaces()
+
+def _restore_surfaces():
+    for item in list(world.objects) + list(world.effects):
+        if item._surf is None:
+            item._surf = rotation_cache.rotate(item._orig_surf, item._angle)[0]
+    for gui in world.guis:
+        if hasattr(gui, "update_surface"):
+            gui.update_surface()
+
+######## In memory ########
+
+PLAIN, CONTAINER, OBJECT, RECT = 1, 2, 3, 4
+
+class _Kinds(dict):
+
+    def __missing__(self, cls):
+        # Instances of the classes of the game (spaceships, weapons, pilots, blueprints...) get their own entry
+        game_class = cls.__module__.startswith(("library.", "participant_")) or cls.__module__ == "game"
+        kind = self[cls] = OBJECT if game_class and hasattr(cls, "__dict__") and not issubclass(cls, Enum) else PLAIN
+        return kind
+
+_kinds = _Kinds({list: CONTAINER, dict: CONTAINER, set: CONTAINER, ZRect: RECT}) # Tuples cannot change
+
+# Tables of the globals the objects only read (the frames of the effects), they are not copied
+CONSTANTS = {id(table) for table in [EXPLOSION_FRAMES] + EXPLOSION_FRAMES}
+
+def _copy_rect(rect):
+    copy = object.__new__(ZRect) # Without the checks of ZRect.__init__
+    copy.__dict__.update(rect.__dict__)
+    copy.rect = copy
+    return copy
+
+def _copy(value, found):
+    # Containers are copied, so later changes do not reach the snapshot. Objects of the
+    # game are not copied but added to found, they get their own entry in the snapshot.
+    # Returns the copy and whether it holds other containers (a plain copy() restores it).
+    kind = type(value)
+    if kind is list or kind is dict:
+        items = value.values() if kind is dict else value
+        kinds = list(map(_kinds.__getitem__, map(type, items)))
+        if CONTAINER in kinds or RECT in kinds:
+            if kind is list:
+                return [_copy(item, found)[0] for item in value], False
+            return {key: _copy(item, found)[0] for key, item in value.items()}, False
+        if found is not None and OBJECT in kinds:
+            found.extend(compress(items, map(OBJECT.__eq__, kinds)))
+        return value.copy(), True
+    if kind is set:
+        return set(value), True
+    if kind is ZRect:
+        return _copy_rect(value), False
+    if found is not None and _kinds[kind] == OBJECT:
+        found.append(value)
+    return value, False
+
+def _copy_state(state, found = None, rects = None):
+    # Returns the copy and the keys holding containers (only those need copying again on restore).
+    # Most attributes are numbers, their kinds are looked up with map() to keep this fast.
+    # The rect of an Actor belongs to it alone, with rects its values are kept to be put back in place.
+    state = state.copy()
+    containers = []
+    kinds = list(map(_kinds.__getitem__, map(type, state.values())))
+    for key, kind in compress(zip(state, kinds), map(PLAIN.__ne__, kinds)):
+        value = state[key]
+        if kind == OBJECT:
+            if found is not None:
+                found.append(value)
+        elif kind == RECT and rects is not None:
+            rects.append((value.__dict__, value.__dict__.copy()))
+        elif id(value) not in CONSTANTS:
+            state[key], flat = _copy(value, found)
+            containers.append((key, flat))
+    return state, containers
+
+def _put_state(target, state, containers):
+    target.update(state)
+    for key, flat in containers:
+        target[key] = state[key].copy() if flat else _copy(state[key], None)[0]
+
+class Snapshot():
+
+    def __init__(self, extra = ()):
+        # extra are more objects to keep, for example the pilot of a Simulation
+        self.tick = scheduler.tick
+        self.objects = [] # (object, attributes, keys of the containers)
+        self.rects = [] # (attributes of the rect, their values)
+        pending = list(pilots) + list(extra) + [controller for controller in (game.player1, player2) if controller]
+        for registry in (world.objects, world.effects, world.guis):
+            pending += registry._items
+            pending += registry._added
+        for store in stores: # Removed objects can still be in a store or wait in a pool
+            pending += store.objects
+        for pool in pools:
+            pending += pool._free
+        seen = set()
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            self.objects.append((obj, *_copy_state(obj.__dict__, pending, self.rects)))
+
+        # The singletons keep their attributes, only the values change
+        self.singletons = [(item.__dict__, *_copy_state(item.__dict__))
+                           for item in [world, world.objects, world.effects, world.guis, world.budget, broadphase] + pools]
+        self.singletons += [(vars(module), *_copy_state({key: value for key, value in vars(module).items()
+                                                         if type(value) in PARTICIPANT_VALUES and not key.startswith("__")}))
+                            for module in _participants().values()]
+        self.pilots = list(pilots)
+
+        self.stores = [(store, store.count, list(store.objects), [getattr(store, name)[:store.count].copy() for name in COLUMNS])
+                       for store in stores]
+        # Only the buckets with timers that are still due, the entries in the others do not match _due
+        self.scheduler = (scheduler.tick, dict(scheduler._due),
+                          {index: list(scheduler._buckets[index]) for index in {due % scheduler.size for due in scheduler._due.values()}})
+        self.rng = ([getattr(rng, name).getstate() for name in STREAMS], rng.master_seed, random.getstate(), numpy.random.get_state())
+
+def snapshot(extra = ()):
+    return Snapshot(extra)
+
+def restore(snapshot):
+    # The containers are copied again, a snapshot can be restored any number of times
+    for obj, state, containers in snapshot.objects:
+        obj.__dict__.clear()
+        _put_state(obj.__dict__, state, containers)
+    for target, state in snapshot.rects:
+        target.update(state)
+    for target, state, containers in snapshot.singletons:
+        _put_state(target, state, containers)
+    pilots[:] = snapshot.pilots
+
+    for store, count, objects, columns in snapshot.stores:
+        store.count = count
+        store.objects = list(objects)
+        for name, column in zip(COLUMNS, columns):
+            getattr(store, name)[:count] = column
+
+    scheduler.tick, due, buckets = snapshot.scheduler
+    scheduler._due = dict(due)
+    for index, bucket in buckets.items():
+        scheduler._buckets[index] = list(bucket)
+
+    streams, rng.master_seed, state, numpy_state = snapshot.rng
+    for name, stream in zip(STREAMS, streams):
+        getattr(rng, name).setstate(stream)
+    random.setstate(state)
+    numpy.random.set_state(numpy_state)
@@ -1,9 +1,8 @@
 from inspect import signature
 from inspect import getdoc
 
-from pgzero.clock import clock
-
-from library.utils import Object, world, clamp_value
+from library.utils import Object, COLLISIONS, world, clamp_value
+from library.scheduler import scheduler
 from library.globals import FPS, PLAYER_START_POS, ENEMY_START_POS, MAX_ABILITY_MSG_LENGTH, MIN_ABILITY_DURATION, MAX_ABILITY_DURATION, MIN_COOLDOWN, MAX_COOLDOWN, WIDTH, HEIGHT, Type, Team
 from library.gui import Text
 from library.weapon import Weapon
@@ -25,16 +24,19 @@ def default_update(spaceship):
 
 class Spaceship(Object):
 
+    type = Type.SPACESHIP
+    _enemy = False # Counted by world.enemies_left and world.enemy_health
+
     def __init__(self, weapon: Weapon, health, image, speed, team, ability_function, ability_duration, cooldown_duration, update_function = None, dummy = False):
         if team == Team.ENEMY:
             pos = ENEMY_START_POS
             angle = 180
-            if not dummy:
-                world.enemy_spaceships.append(self)
         else:
             pos = PLAYER_START_POS
             angle = 0
         super().__init__(image, pos=pos, angle=angle, health=health, speed=speed, team=team, dummy=dummy)
+        if team == Team.ENEMY and not dummy:
+            world.add_enemy_spaceship(self)
 
         self.weapon = weapon.copy() if weapon else None
         self._control = Player1("Player1")
@@ -113,6 +115,19 @@ class Spaceship(Object):
         else:
             self._weapon = None
 
+    @property
+    def health(self):
+        return self._health
+
+    @health.setter
+    def health(self, value):
+        if not self._enemy:
+            Object.health.fset(self, value)
+            return
+        before = self._health
+        Object.health.fset(self, value)
+        world.enemy_health_changed(before, self._health)
+
     @property
     def collidable(self):
         return self._collidable
@@ -139,7 +154,7 @@ class Spaceship(Object):
         self.image = self._blueprint.image
         self.max_health = self._blueprint.health
         self.speed = self._blueprint.speed
-        self._ability = self._blueprint.ability_function
+        self._ability = self._fix_callable(self._blueprint.ability_function)
         self.ability_duration = self._blueprint.ability_duration
         self.cooldown = self._blueprint.cooldown_duration
         self.collidable = True
@@ -153,7 +168,7 @@ class Spaceship(Object):
 
         #After the cooldown reset the action points
         self._cooldown_timer_frames = self._cooldown_frames
-        clock.schedule_unique(self._reset_actions, self.cooldown)
+        scheduler.schedule_unique(self._reset_actions, self.cooldown)
 
     def _reset_actions(self):
         # Reset the character's action points
@@ -193,21 +208,41 @@ class Spaceship(Object):
             elif isinstance(self.control, Player2):
                 Text(self._ability_message, (WIDTH - 185, HEIGHT - 55), frames_duration=200, fontname='future_thin', fontsize=14, color=(255,255,255), fade = True)
             #After the duration reset the ability's effects
-            clock.schedule_unique(self._reset, self.ability_duration)
-
-    def collide(self, object):
-        super().collide(object)
-        if object.type == Type.ASTEROID:
-            self._damage(object.damage)
-        elif object.type == Type.PROJECTILE:
-            self._damage(object.damage)
-        elif object.type == Type.POWERUP and self.team != Team.ENEMY:
-            message = getdoc(object.effect)
+            scheduler.schedule_unique(self._reset, self.ability_duration)
+
+    def _hit(self, object):
+        self._damage(object.damage)
+
+    def _pick_up(self, powerup):
+        if self.team != Team.ENEMY:
+            message = getdoc(powerup.effect)
             if message:
                 message = message.replace("\n"," ")
                 Text(message[:30], (5,HEIGHT - 55), frames_duration=200, fontname='future_thin', fontsize=14, color=(255,255,255), fade = True)
-            object.effect(self)
-    
+            powerup.effect(self)
+
     def deploy_reflector(self):
         reflector = Reflector(image = 'others/metal_wall', pos = (self.x, self.y - 60*self.team.value), timespan = self.ability_duration, team=self.team)
-        self.add_child( reflector )
\ No newline at end of file
+        self.add_child( reflector )
+
+COLLISIONS[Type.SPACESHIP, Type.ASTEROID] = Spaceship._hit
+COLLISIONS[Type.SPACESHIP, Type.PROJECTILE] = Spaceship._hit
+COLLISIONS[Type.SPACESHIP, Type.POWERUP] = Spaceship._pick_up
+
+def spaceship_from_blueprint(blueprint: SpaceshipBlueprint, team = None):
+    weapon = Weapon(firerate = blueprint.weapon.firerate,
+                    barrels = blueprint.weapon.barrels,
+                    damage = blueprint.weapon.damage,
+                    speed = blueprint.weapon.speed,
+                    spread_angle = blueprint.weapon.spread_angle,
+                    randomness = blueprint.weapon.randomness) if blueprint.weapon else None
+
+    return Spaceship(image = blueprint.image,
+                     health = blueprint.health,
+                     speed = blueprint.speed,
+                     ability_function = blueprint.ability_function,
+                     ability_duration = blueprint.ability_duration,
+                     cooldown_duration = blueprint.cooldown_duration,
+                     update_function = blueprint.update_function,
+                     weapon = weapon,
+                     team = team if team is not None else blueprint.team)
@@ -0,0 +1,72 @@
+import os
+import sys
+
+# Students start the game again and again, most of the time until the window
+# opens is spent importing pygame and numpy. import_pygame() saves the slowest
+# part of it and "python -m library.startup" shows where the time goes.
+#
+# This module is imported before pygame, it must not import pygame itself or any
+# module of the game at the top. The modules of the report are imported by it.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_pygame():
+    # pygame imports pkg_resources only to find its own files when it is installed as
+    # a zipped egg, and importing pkg_resources takes about as long as all of pygame.
+    # While it cannot be imported pygame looks for its files in its folder instead.
+    if "pygame" in sys.modules or "pkg_resources" in sys.modules:
+        return
+    sys.modules["pkg_resources"] = None # Makes "import pkg_resources" fail
+    try:
+        import pygame
+    finally:
+        del sys.modules["pkg_resources"]
+
+def import_times(module = "game"):
+    # Imports module in a new process without a window, returns the seconds it took and
+    # the imports as (name, depth, own seconds, seconds with the imports it made) in order
+    import subprocess
+    code = ("import sys, time; sys.path.insert(0, sys.argv[1]); start = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - start)")
+    env = dict(os.environ, SDL_VIDEODRIVER = "dummy", SDL_AUDIODRIVER = "dummy", PYGAME_HIDE_SUPPORT_PROMPT = "1")
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code, ROOT], cwd = ROOT, env = env,
+                             capture_output = True, text = True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1)//2
+        imports.append((name.strip(), depth, int(own)/1e6, int(cumulative)/1e6))
+    return float(process.stdout.strip().splitlines()[-1]), imports
+
+def report(module = "game", top = 12):
+    seconds, imports = import_times(module)
+    lines = [f"Importing {module} took {seconds*1000:.0f} ms"]
+    lines.append("")
+    lines.append(f"{'Slowest imports, with what they import':<50} {'ms':>8}")
+    outer = [item for item in imports if item[1] <= 1]
+    for name, depth, own, cumulative in sorted(outer, key = lambda item: -item[3])[:top]:
+        lines.append(f"{'  '*depth + name:<50} {cumulative*1000:>8.1f}")
+    lines.append("")
+    lines.append(f"{'Slowest modules on their own':<50} {'ms':>8}")
+    for name, depth, own, cumulative in sorted(imports, key = lambda item: -item[2])[:top]:
+        lines.append(f"{name:<50} {own*1000:>8.1f}")
+    game_modules = [item for item in imports if item[0] == "game" or item[0].startswith("library.")]
+    lines.append("")
+    lines.append(f"Modules of the game on their own: {sum([item[2] for item in game_modules])*1000:.1f} ms")
+    return "\n".join(lines)
+
+def main(argv = None):
+    import argparse
+    parser = argparse.ArgumentParser(description = "Show how long importing the game takes and which imports are the slowest.")
+    parser.add_argument("module", nargs = "?", default = "game", help = "module to import (default game)")
+    parser.add_argument("--top", type = int, default = 12, help = "number of imports listed (default 12)")
+    args = parser.parse_args(argv)
+    print(report(args.module, args.top))
+
+if __name__ == "__main__":
+    main()
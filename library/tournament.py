@@ -0,0 +1,315 @@
+import os
+import re
+import sys
+import json
+import zlib
+import signal
+import argparse
+import itertools
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# A tournament plays every participant script against the others without opening
+# a window. The matches run in a pool of processes (one per core by default);
+# every process imports the game headless once and loads each script only the
+# first time it needs it. Finished matches are appended to a checkpoint file, so
+# running the same command again after an interruption only plays what is missing.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+MATCH_TICKS = 3*60*60 # 3 minutes of game time per match
+TIME_LIMIT = 120 # Seconds of wall clock per match
+POINTS = {"won": 3, "drawn": 1, "lost": 0}
+
+PARTICIPANT_PATTERN = re.compile(r"^\s*(import game\b|from game import)", re.MULTILINE)
+PLAY_PATTERN = re.compile(r"\bplay\(\s*\)")
+
+def discover(directory = ROOT):
+    # Participant scripts import the game and call play(), everything else is skipped
+    scripts = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith(".py") or name == "game.py" or not os.path.isfile(path):
+            continue
+        with open(path, encoding = "utf-8") as file:
+            source = file.read()
+        if PARTICIPANT_PATTERN.search(source) and PLAY_PATTERN.search(source):
+            scripts.append(path)
+    return scripts
+
+def participant_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+@dataclass
+class MatchRecord():
+
+    key: str
+    player: str # Flies the player's side of the match
+    enemy: str
+    winner: str = None # None for a draw
+    ticks: int = 0
+    player_health: float = 0
+    enemy_health: float = 0
+    timed_out: bool = False
+    error: str = None
+    seed: int = 0
+    max_ticks: int = 0
+    forfeit: str = None # The participant whose script failed, the match is lost for it
+
+    @property
+    def void(self):
+        # Failed without knowing whose fault it was, the match does not count
+        return self.error is not None and self.forfeit is None
+
+    def outcome(self, name):
+        if self.forfeit is not None:
+            return "lost" if self.forfeit == name else "won"
+        if self.winner is None:
+            return "drawn"
+        return "won" if self.winner == name else "lost"
+
+    def margin(self, name):
+        # Health left minus the health of the opponent, used to break ties
+        if name == self.player:
+            return self.player_health - self.enemy_health
+        return self.enemy_health - self.player_health
+
+class MatchTimeout(Exception):
+    pass
+
+def raise_match_timeout(signum, frame):
+    # Signal handler for the alarm that stops a match (also used by library.optimizer)
+    raise MatchTimeout()
+
+# Loaded blueprints of the current worker process, by script path
+_blueprints = {}
+
+def script_blueprint(path):
+    # The blueprint of a participant script, each script is loaded once per process
+    from library.simulation import load_blueprint
+    if path not in _blueprints:
+        _blueprints[path] = load_blueprint(path)
+    return _blueprints[path]
+
+def _failed_participant(error, names):
+    # The participant whose script was running when error was raised (the deepest frame of a script)
+    failed = None
+    traceback = error.__traceback__
+    while traceback is not None:
+        module = traceback.tb_frame.f_globals.get("__name__", "")
+        if module.startswith("participant_") and module[len("participant_"):] in names:
+            failed = module[len("participant_"):]
+        traceback = traceback.tb_next
+    return failed
+
+def play_match(key, player_path, enemy_path, seed, max_ticks, time_limit):
+    # Runs inside a worker process, the arguments are plain data so they can be pickled
+    from library.simulation import Simulation
+
+    record = MatchRecord(key, participant_name(player_path), participant_name(enemy_path), seed = seed, max_ticks = max_ticks)
+
+    # Simulation.run() checks the time limit once per second of game time. The alarm
+    # also stops update functions that never return.
+    alarm = time_limit and hasattr(signal, "setitimer")
+    if alarm:
+        signal.signal(signal.SIGALRM, raise_match_timeout)
+        signal.setitimer(signal.ITIMER_REAL, time_limit + 5)
+    loading = record.player # A script that fails while it is loaded forfeits the match
+    try:
+        player = script_blueprint(player_path)
+        loading = record.enemy
+        enemy = script_blueprint(enemy_path)
+        loading = None
+        simulation = Simulation(player, enemy, seed)
+        try:
+            result = simulation.run(max_ticks, time_limit)
+        except MatchTimeout:
+            result = simulation.result(time_limit, timed_out = True)
+    except Exception as exception:
+        if isinstance(exception, MatchTimeout):
+            record.timed_out = True
+            record.error = "MatchTimeout: the time limit ran out before the match started"
+        else:
+            record.error = f"{exception.__class__.__name__}: {exception}"
+        record.forfeit = loading or _failed_participant(exception, (record.player, record.enemy))
+        return record
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    if result.end_game == 1:
+        record.winner = record.player
+    elif result.end_game == -1:
+        record.winner = record.enemy
+    record.ticks = result.ticks
+    record.player_health = result.player_health
+    record.enemy_health = result.enemy_health
+    record.timed_out = result.timed_out
+    return record
+
+class Tournament():
+
+    def __init__(self, scripts, seed = 0, max_ticks = MATCH_TICKS, time_limit = TIME_LIMIT,
+                 workers = None, checkpoint = None):
+        self.scripts = {participant_name(path): os.path.abspath(path) for path in scripts}
+        self.seed = seed
+        self.max_ticks = max_ticks
+        self.time_limit = time_limit
+        self.workers = workers or os.cpu_count()
+        self.checkpoint = checkpoint
+        self.records = {}
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return
+        with open(self.checkpoint, encoding = "utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = MatchRecord(**json.loads(line))
+                # Matches played with other settings do not count
+                if record.seed == self._match_seed(record.key) and record.max_ticks == self.max_ticks and not record.void:
+                    self.records[record.key] = record
+
+    def _save(self, record):
+        self.records[record.key] = record
+        if self.checkpoint:
+            with open(self.checkpoint, "a", encoding = "utf-8") as file:
+                file.write(json.dumps(asdict(record)) + "\n")
+
+    def _match_seed(self, key):
+        # Same seed for the same match in every run, whatever process plays it
+        return zlib.crc32(f"{self.seed}:{key}".encode())
+
+    def play(self, matches, report = print):
+        # matches is a list of (key, player, enemy), only the missing ones are played
+        missing = [m for m in matches if m[0] not in self.records]
+        if report and len(missing) < len(matches):
+            report(f"Resuming: {len(matches) - len(missing)} of {len(matches)} matches already played")
+        if missing:
+            with ProcessPoolExecutor(max_workers = min(self.workers, len(missing))) as executor:
+                futures = [executor.submit(play_match, key, self.scripts[player], self.scripts[enemy],
+                                           self._match_seed(key), self.max_ticks, self.time_limit)
+                           for key, player, enemy in missing]
+                for future in as_completed(futures):
+                    record = future.result()
+                    self._save(record)
+                    if report:
+                        report(describe(record))
+        return [self.records[key] for key, _, _ in matches]
+
+    def round_robin(self, report = print):
+        # Every pair meets twice, each participant flies the player's side once
+        names = list(self.scripts)
+        matches = [(f"round-robin:{a}:{b}", a, b) for a, b in itertools.permutations(names, 2)]
+        return self.play(matches, report)
+
+    def bracket(self, report = print):
+        # Single elimination, a pair plays both sides and the one with more wins goes through.
+        # Ties go to the bigger health margin and then to the earlier seed.
+        alive = list(self.scripts)
+        records = []
+        round_number = 1
+        # The first seeds skip the first round so that the rest of the rounds have no byes
+        size = 1
+        while size < len(alive):
+            size *= 2
+        byes = size - len(alive)
+        pairs = [[name] for name in alive[:byes]] + [alive[i:i + 2] for i in range(byes, len(alive), 2)]
+        while len(alive) > 1:
+            matches = []
+            for pair in pairs:
+                if len(pair) == 2:
+                    a, b = pair
+                    matches.append((f"bracket:{round_number}:{a}:{b}", a, b))
+                    matches.append((f"bracket:{round_number}:{b}:{a}", b, a))
+            played = self.play(matches, report)
+            records.extend(played)
+
+            winners = []
+            for pair in pairs:
+                if len(pair) == 1: # A bye
+                    winners.append(pair[0])
+                    continue
+                legs = [r for r in played if {r.player, r.enemy} == set(pair)]
+                def strength(name):
+                    return (sum([r.outcome(name) == "won" for r in legs]), sum([r.margin(name) for r in legs]))
+                winners.append(max(pair, key = strength))
+            if report:
+                report(f"Round {round_number}: {', '.join(winners)} go through")
+            alive = winners
+            pairs = [alive[i:i + 2] for i in range(0, len(alive), 2)]
+            round_number += 1
+        self.champion = alive[0] if alive else None
+        return records
+
+def standings(records):
+    # Forfeits are lost by the participant that failed, void matches only show up in the "void" column
+    table = {}
+    for record in records:
+        for name in (record.player, record.enemy):
+            row = table.setdefault(name, {"name": name, "played": 0, "won": 0, "drawn": 0, "lost": 0,
+                                          "points": 0, "margin": 0, "forfeits": 0, "void": 0})
+            if record.void:
+                row["void"] += 1
+                continue
+            outcome = record.outcome(name)
+            row["played"] += 1
+            row[outcome] += 1
+            row["points"] += POINTS[outcome]
+            row["forfeits"] += record.forfeit == name
+            if record.forfeit is None:
+                row["margin"] += record.margin(name)
+    return sorted(table.values(), key = lambda row: (-row["points"], -row["margin"], row["name"]))
+
+def format_table(rows):
+    width = max([len(row["name"]) for row in rows] + [11])
+    # F: matches lost by forfeit (counted in L too), V: void matches that were not counted
+    lines = [f"{'#':>3}  {'Participant':<{width}}  {'P':>3} {'W':>3} {'D':>3} {'L':>3} {'F':>3} {'V':>3}  {'Health +/-':>10}  {'Pts':>4}"]
+    for rank, row in enumerate(rows, 1):
+        lines.append(f"{rank:>3}  {row['name']:<{width}}  {row['played']:>3} {row['won']:>3} {row['drawn']:>3} "
+                     f"{row['lost']:>3} {row['forfeits']:>3} {row['void']:>3}  {row['margin']:>10.0f}  {row['points']:>4}")
+    return "\n".join(lines)
+
+def describe(record):
+    if record.forfeit:
+        return f"{record.player} vs {record.enemy}: {record.forfeit} forfeits ({record.error})"
+    if record.error:
+        return f"{record.player} vs {record.enemy}: failed ({record.error})"
+    result = f"{record.winner} won" if record.winner else "draw"
+    if record.timed_out:
+        result += ", stopped by the time limit"
+    return f"{record.player} vs {record.enemy}: {result} after {record.ticks} ticks"
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Play a tournament between participant scripts on every core.")
+    parser.add_argument("scripts", nargs = "*", help = "participant scripts (default: every script next to game.py)")
+    parser.add_argument("--mode", choices = ["round-robin", "bracket"], default = "round-robin",
+                        help = "round-robin: everyone plays everyone, bracket: single elimination")
+    parser.add_argument("--ticks", type = int, default = MATCH_TICKS, help = f"maximum ticks per match (default {MATCH_TICKS})")
+    parser.add_argument("--timeout", type = float, default = TIME_LIMIT, help = f"seconds per match (default {TIME_LIMIT})")
+    parser.add_argument("--workers", type = int, help = "number of processes (default: one per core)")
+    parser.add_argument("--seed", type = int, default = 0, help = "tournament seed, the same seed plays the same matches")
+    parser.add_argument("--checkpoint", default = "tournament.jsonl",
+                        help = "file of the finished matches, to resume an interrupted tournament (default tournament.jsonl)")
+    args = parser.parse_args(argv)
+
+    scripts = args.scripts or discover()
+    if len(scripts) < 2:
+        sys.exit("A tournament needs at least two participant scripts")
+
+    tournament = Tournament(scripts, args.seed, args.ticks, args.timeout, args.workers, args.checkpoint)
+    if args.mode == "round-robin":
+        records = tournament.round_robin()
+    else:
+        records = tournament.bracket()
+    print()
+    print(format_table(standings(records)))
+    if args.mode == "bracket":
+        print(f"\nChampion: {tournament.champion}")
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,217 @@
 import math
 
-from pgzero.clock import clock
 from pgzero.actor import Actor
 
 from library.globals import WIDTH, HEIGHT, Team, Type
+from library.budget import Budget
+from library.scheduler import scheduler
+from library.rotation import rotation_cache
 
 class Background(Actor):
 
     def __init__(self, image):
         super().__init__(image)
 
+class Registry():
+    # Keeps the objects, effects or guis of the world.
+    # Every item gets a handle (an integer that is never reused) that can be
+    # resolved with get(). Adding and removing items is queued and applied by
+    # flush(), so the update loops can iterate the registry while items are
+    # created or destroyed. flush() compacts the removed items in one pass and
+    # keeps the order of the remaining ones.
+
+    def __init__(self, on_remove = None):
+        self._items = []
+        self._handles = {}
+        self._added = []
+        self._removed = {}
+        self._next_handle = 1
+        self._on_remove = on_remove # Called with every item flush() removes
+
+    def add(self, item):
+        item._handle = self._next_handle
+        self._next_handle += 1
+        self._handles[item._handle] = item
+        self._added.append(item)
+
+    def remove(self, item):
+        if self._handles.get(getattr(item, "_handle", None)) is item:
+            self._removed[item] = None
+
+    def get(self, handle):
+        item = self._handles.get(handle)
+        if item is None or item in self._removed:
+            return None
+        return item
+
+    def flush(self):
+        removed = self._removed
+        if removed:
+            self._removed = {}
+            self._items = [i for i in self._items if i not in removed]
+            self._added = [i for i in self._added if i not in removed]
+            for item in removed:
+                del self._handles[item._handle]
+                if self._on_remove:
+                    self._on_remove(item)
+        if self._added:
+            # A new list, so a loop still iterating the old one is not affected
+            self._items = self._items + self._added
+            self._added = []
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __contains__(self, item):
+        return self._handles.get(getattr(item, "_handle", None)) is item
+
+def _leave_world(item):
+    item._on_remove()
+
+def _object_leave_world(object):
+    world.budget.forget(object)
+    world.unindex(object)
+    object._on_remove()
+
 class World():
+    # Besides the registries the world keeps indices that are updated when objects
+    # come, go or change team, so they never need a scan of all the objects:
+    #   - the objects by team and type, see find() and count()
+    #   - the number of enemy spaceships with health left and their total health,
+    #     updated by Spaceship.health (enemies_left decides when the player wins)
+    # Like "in world.objects", the indices include the objects added in this frame
+    # and keep removed objects until the next flush(), except the ones the budget
+    # removes to make room.
 
     def __init__(self):
-        self.objects = []
-        self.effects = []
-        self.guis = []
+        self.clear()
+
+    def clear(self):
+        self.objects = Registry(on_remove = _object_leave_world)
+        self.effects = Registry(on_remove = _leave_world)
+        self.guis = Registry()
         self.end_game = 0
         self.player1 = None
         self.player2 = None
         self.enemy_spaceships = []
+        self.enemies_left = 0
+        self.enemy_health = 0
+        self.budget = Budget(self)
+        self._index = {} # (team, type) -> objects, oldest first
 
     def add_object(self, object):
-        self.objects.append(object)
+        self.objects.add(object)
+        self.budget.track(object)
+        self._add_to_index(object)
+
+    def _add_to_index(self, object):
+        object._index_key = (object.team, object.type)
+        self._index.setdefault(object._index_key, {})[object] = None
+
+    def unindex(self, object):
+        # Also used by the budget, the objects it removes are not counted while they wait for the flush
+        if object._index_key is not None:
+            self._index.get(object._index_key, {}).pop(object, None)
+            object._index_key = None
+
+    def _change_team(self, object):
+        # Called by Object.team when an indexed object switches sides (reflected projectiles and asteroids)
+        self.unindex(object)
+        self._add_to_index(object)
+
+    def find(self, team = None, type = None):
+        # The objects of a team and a type, None for any, in the order they were added to the world
+        if team is not None and type is not None:
+            return list(self._index.get((team, type), ()))
+        found = []
+        for (object_team, object_type), objects in self._index.items():
+            if (team is None or object_team == team) and (type is None or object_type == type):
+                found += objects
+        return found
+
+    def count(self, team = None, type = None):
+        if team is not None and type is not None:
+            return len(self._index.get((team, type), ()))
+        return sum([len(objects) for (object_team, object_type), objects in self._index.items()
+                    if (team is None or object_team == team) and (type is None or object_type == type)])
+
+    def add_enemy_spaceship(self, spaceship):
+        self.enemy_spaceships.append(spaceship)
+        self._count_enemy(spaceship, 1)
+
+    def replace_enemy_spaceship(self, old, new):
+        # new takes the place of old in the list, the order of the enemies matters to the replays
+        if new in self.enemy_spaceships:
+            self.enemy_spaceships.remove(new)
+            self._count_enemy(new, -1)
+        self.enemy_spaceships[self.enemy_spaceships.index(old)] = new
+        self._count_enemy(old, -1)
+        self._count_enemy(new, 1)
+
+    def _count_enemy(self, spaceship, sign):
+        spaceship._enemy = sign > 0
+        self.enemies_left += sign*(spaceship.health > 0)
+        self.enemy_health += sign*spaceship.health
+        if self.enemies_left == 0:
+            self.enemy_health = 0 # Without the rounding errors of the additions
+
+    def enemy_health_changed(self, before, after):
+        self.enemies_left += (after > 0) - (before > 0)
+        self.enemy_health = self.enemy_health + after - before if self.enemies_left else 0
 
     def remove_object(self, object):
         self.objects.remove(object)
-        del object
 
     def add_effect(self, effect):
-        self.effects.append(effect)
+        self.effects.add(effect)
 
     def remove_effect(self, effect):
         self.effects.remove(effect)
-        del effect
 
     def add_gui(self, gui):
-        self.guis.append(gui)
+        self.guis.add(gui)
 
     def remove_gui(self, gui):
         self.guis.remove(gui)
-        del gui
 
     def extend_objects(self, object_list):
-        self.objects.extend(object_list)
-
-class CollisionInformation():
-
-    def __init__(self, object):
-        self.type = Type[object.__class__.__name__.upper()]
-        self.team = object.team if object.team else Team.NEUTRAL
-        self.damage = object.damage if object.damage else 0
-        self.effect = object.effect if self.type == Type.POWERUP else None
+        for object in object_list:
+            self.add_object(object)
+
+    def flush(self):
+        # Applies the queued additions and removals
+        self.objects.flush()
+        self.effects.flush()
+        self.guis.flush()
+
+# What happens to an object when it collides with another one, by their types:
+# (type of the object, type of the other object) -> function(object, other object).
+# The modules of the classes add their responses under the class, pairs that are
+# not in the table do nothing. update_objects() looks the responses up itself,
+# collide() does the same for one pair.
+COLLISIONS = {}
 
 def clamp_value(value, smallest, largest): 
     return max(smallest, min(value, largest))
 
 class Object(Actor):
-        
+
+    type = None # The Type of the objects of the class, set by every class of objects
+    _index_key = None # Where the world keeps the object, None while it is not in the world
+
     def __init__(self, image, pos, speed = 0, health = 1, direction = 0, timespan = -1, spin = 0, angle = 0, damage = 0, collidable = True, source = None, team = Team.NEUTRAL, dummy = False):
-        super().__init__(image, pos)
+        if "_rect" in self.__dict__ and self._image_name == image:
+            # Recycled by a pool, the surfaces are still valid
+            self.pos = pos
+        else:
+            self._angle = 0.0 # The new surface is not rotated, even if the object was recycled
+            super().__init__(image, pos)
         self.angle = angle
         self.speed = speed
         self.max_health = health
@@ -80,7 +232,7 @@ class Object(Actor):
             world.add_object(self)
         
         if self.timespan > 0:
-            clock.schedule_unique(self.kill, self.timespan)
+            scheduler.schedule_unique(self.kill, self.timespan)
 
     @property
     def direction(self):
@@ -99,6 +251,26 @@ class Object(Actor):
     def health(self, value):
         self._health = clamp_value(value, 0, self.max_health)
 
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, value):
+        # Rotating the surface is expensive, skip it when nothing changes
+        if value != self._angle:
+            rotation_cache.rotate_actor(self, value)
+
+    @property
+    def team(self):
+        return self._team
+
+    @team.setter
+    def team(self, value):
+        self._team = value
+        if self._index_key is not None:
+            world._change_team(self)
+
     @property
     def collidable(self):
         return self._collidable
@@ -180,12 +352,17 @@ class Object(Actor):
         
 
     def collide(self, object):
-        pass
-        # print(f"{type(self).__name__} collided with", type(object).__name__)
+        response = COLLISIONS.get((self.type, object.type))
+        if response:
+            response(self, object)
 
     def kill(self):
         self.alive = False
 
+    def _on_remove(self):
+        # Called when the object leaves the world
+        pass
+
 background = Background('others/background')
 world = World()
 
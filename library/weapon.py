@@ -1,12 +1,11 @@
 import math
-import numpy
 
-from pgzero.clock import clock
-
-from library.projectile import Projectile
+from library.projectile import projectile_pool
 from library.globals import IMAGES_PROJECTILES, MIN_WEAPON_FIRERATE, MAX_WEAPON_FIRERATE, MIN_WEAPON_BARRELS, MAX_WEAPON_BARRELS
-from library.globals import MIN_WEAPON_SPREAD_ANGLE, MAX_WEAPON_SPREAD_ANGLE, MIN_WEAPON_RANDOMNESS, MAX_WEAPON_RANDOMNESS
-from library.utils import clamp_value
+from library.globals import MIN_WEAPON_SPREAD_ANGLE, MAX_WEAPON_SPREAD_ANGLE, MIN_WEAPON_RANDOMNESS, MAX_WEAPON_RANDOMNESS, Type
+from library.utils import clamp_value, world
+from library.scheduler import scheduler
+from library.rng import rng
 
 class Weapon():
 
@@ -59,16 +58,18 @@ class Weapon():
         if self._gun_ready and self._mount:
             projectiles = []
             for i in range(self._barrels):
+                if not self._dummy and not world.budget.admit(Type.PROJECTILE):
+                    continue
                 if self.spread_angle and self.barrels > 1:
                     proj_direction = -self.spread_angle/2 + (i*self.spread_angle/(self.barrels-1))
                 else:
                     proj_direction = 0
                 if self.randomness:
-                    proj_direction = proj_direction + numpy.random.normal(scale=self.randomness)
+                    proj_direction = proj_direction + rng.weapons.gauss(0, self.randomness)
                 proj_start_pos = tuple([sum(x) for x in zip(self._mount.pos, (self._muzzles_pos[i][0], self._muzzles_pos[i][1]*self._mount.team.value))])
-                projectiles.append( Projectile(self._get_image(), proj_start_pos, source = self._mount, damage = self.damage, speed = self.speed, team=self._mount.team, direction=proj_direction, dummy=self._dummy ) )
+                projectiles.append( projectile_pool.acquire(self._get_image(), proj_start_pos, source = self._mount, damage = self.damage, speed = self.speed, team=self._mount.team, direction=proj_direction, dummy=self._dummy ) )
             self._gun_ready = False
-            clock.schedule_unique(self.reload, 1/self.firerate)
+            scheduler.schedule_unique(self.reload, 1/self.firerate)
             return projectiles
     
     def reload(self):
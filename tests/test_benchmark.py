@@ -0,0 +1,29 @@
+import game
+from library.benchmark import SCENARIOS, run
+from library.utils import world
+from library.globals import Team, Type
+
+def test_player_side_fires_in_every_scenario():
+    for scenario in SCENARIOS:
+        simulation = scenario.simulation()
+        projectiles = 0
+        for _ in range(120):
+            simulation.step()
+            projectiles += world.count(Team.PLAYER, Type.PROJECTILE)
+        assert projectiles > 0, scenario.name
+
+def test_asteroid_storm_goes_past_the_asteroids_limit():
+    storm = [scenario for scenario in SCENARIOS if scenario.name == "asteroid_storm"][0]
+    asteroids_per_second = game.ASTEROIDS_PER_SECOND
+    game.ASTEROIDS_PER_SECOND = storm.asteroids_per_second
+    try:
+        simulation = storm.simulation()
+        for _ in range(600):
+            simulation.step()
+    finally:
+        game.ASTEROIDS_PER_SECOND = asteroids_per_second
+    assert world.count(type = Type.ASTEROID) > 20
+
+def test_same_scenario_same_checksum():
+    duel = SCENARIOS[0]
+    assert run(duel, 300)["checksum"] == run(duel, 300)["checksum"]
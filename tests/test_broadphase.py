@@ -0,0 +1,46 @@
+import random
+
+import pytest
+from pgzero.rect import ZRect
+
+from library.broadphase import create_broadphase, overlaps
+
+class Box():
+
+    def __init__(self, x, y, w, h):
+        self._rect = ZRect(x, y, w, h)
+
+def boxes(generator, count):
+    return [Box(generator.uniform(-50, 800), generator.uniform(-50, 800), generator.uniform(2, 120), generator.uniform(2, 120))
+            for _ in range(count)]
+
+def touching(obj, objects):
+    return {o for o in objects if o is not obj and overlaps(obj, o)}
+
+@pytest.mark.parametrize("backend", ["grid", "sweep", "none"])
+def test_candidates_include_every_touching_object(backend):
+    generator = random.Random(1)
+    broadphase = create_broadphase(backend)
+    objects = boxes(generator, 150)
+    for frame in range(5):
+        broadphase.update(objects)
+        for obj in objects:
+            candidates = broadphase.candidates(obj)
+            assert obj not in candidates
+            assert touching(obj, objects) <= set(candidates)
+        # Move some, drop some and add new ones, like the objects of a frame
+        for obj in objects[::3]:
+            obj._rect.x += generator.uniform(-40, 40)
+            obj._rect.y += generator.uniform(-40, 40)
+        objects = objects[10:] + boxes(generator, 10)
+
+@pytest.mark.parametrize("backend", ["grid", "sweep", "none"])
+def test_removed_objects_are_not_candidates(backend):
+    broadphase = create_broadphase(backend)
+    a, b = Box(0, 0, 10, 10), Box(5, 5, 10, 10)
+    broadphase.update([a, b])
+    assert broadphase.candidates(a) == [b]
+    broadphase.update([a])
+    assert broadphase.candidates(a) == []
+    broadphase.clear()
+    assert broadphase.candidates(a) == []
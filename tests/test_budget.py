@@ -0,0 +1,24 @@
+from library.simulation import Simulation
+from library.projectile import projectile_pool
+from library.utils import world
+from library.globals import Team, Type
+
+def shoot():
+    if world.budget.admit(Type.PROJECTILE):
+        return projectile_pool.acquire(pos = (100, 100), team = Team.PLAYER)
+
+def test_a_full_quota_removes_the_oldest_projectile():
+    Simulation(seed = 1)
+    world.budget.quotas[Type.PROJECTILE] = 3
+    projectiles = [shoot() for _ in range(4)]
+    assert all(projectiles)
+    assert not projectiles[0].alive
+    assert all(projectile.alive for projectile in projectiles[1:])
+    assert world.count(type = Type.PROJECTILE) == 3
+
+def test_nothing_to_remove_refuses_the_object():
+    Simulation(seed = 1)
+    world.budget.quotas[Type.PROJECTILE] = 0
+    refused = world.budget.refused
+    assert shoot() is None
+    assert world.budget.refused == refused + 1
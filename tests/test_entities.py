@@ -0,0 +1,25 @@
+import pytest
+
+from library.simulation import Simulation
+from library.projectile import projectile_pool
+from library.entities import update_stores
+from library.globals import Team
+
+@pytest.mark.parametrize("attribute", ["pos", "center", "topleft", "midbottom"])
+def test_moving_an_entity_moves_it_in_the_store(attribute):
+    Simulation(seed = 1)
+    projectile = projectile_pool.acquire(pos = (100, 100), speed = 5, team = Team.PLAYER)
+    setattr(projectile, attribute, (300, 400))
+    x, y = projectile.pos
+    vx, vy = projectile.velocity()
+    update_stores()
+    assert projectile.pos == pytest.approx((x + vx, y + vy))
+
+def test_left_and_top_move_the_entity():
+    Simulation(seed = 1)
+    projectile = projectile_pool.acquire(pos = (100, 100), speed = 5, team = Team.PLAYER)
+    projectile.left += 50
+    projectile.top -= 20
+    vx, vy = projectile.velocity()
+    update_stores()
+    assert projectile.pos == pytest.approx((150 + vx, 80 + vy))
@@ -0,0 +1,43 @@
+import math
+
+from library.inspector import calculate_ability_points, calculate_points, run_inspection
+from library.laboratory import abilities
+from library.blueprints import SpaceshipBlueprint, WeaponBlueprint
+from library.utils import world
+from library.globals import Team
+
+ABILITY_POINTS = {
+    "super_speed": 16,
+    "invisibility": 20,
+    "too_many_guns": 18,
+    "machine_gun": 10,
+    "reflection": 10,
+    "buff_up": 6,
+    "hypervelocity": 14,
+    "fanfire": 0,
+}
+
+def blueprint(ability):
+    return SpaceshipBlueprint("spaceships/spaceship1", 50, 5, 6, 6, lambda spaceship: None, ability, WeaponBlueprint(3, 1, 2, 6), Team.PLAYER)
+
+def test_laboratory_abilities():
+    objects = len(world.objects) + len(world.objects._added)
+    assert {ability.__name__: calculate_ability_points(ability) for ability in abilities} == ABILITY_POINTS
+    assert len(world.objects) + len(world.objects._added) == objects # fanfire deploys its mines in a sandbox
+
+def test_failing_ability_is_reported():
+    def ability(spaceship):
+        spaceship.weapon.damage = 25
+        spaceship.y = spaceship.top
+        raise ValueError("no")
+    assert calculate_points(blueprint(ability)) == math.inf
+    assert "Ability function raised ValueError: no" in run_inspection(blueprint(ability))
+
+def test_abilities_of_closures_are_scored_apart():
+    def make(damage):
+        def ability(spaceship):
+            spaceship.weapon.damage = damage
+        return ability
+    assert calculate_ability_points(make(1)) < calculate_ability_points(make(100))
+    assert run_inspection(blueprint(make(1))) == ""
+    assert "overpowered" in run_inspection(blueprint(make(100)))
@@ -0,0 +1,22 @@
+import random
+
+from library.optimizer import Evaluation, blueprint, random_genome, repair
+from library.simulation import Simulation
+from library.utils import world
+from library.globals import Team, Type
+
+def test_genome_spaceship_moves_and_fires():
+    rnd = random.Random(1)
+    simulation = Simulation(blueprint(repair(random_genome(rnd), rnd)), None, 5)
+    start = world.player1.x
+    projectiles = 0
+    for _ in range(300):
+        simulation.step()
+        projectiles += world.count(Team.PLAYER, Type.PROJECTILE)
+    assert projectiles > 0
+    assert world.player1.x != start
+
+def test_failed_genomes_rank_last():
+    failed = Evaluation("failed", {}, error = "ValueError: no")
+    lost = Evaluation("lost", {}, lost = 3, margin = -500)
+    assert failed.score < lost.score
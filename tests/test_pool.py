@@ -0,0 +1,29 @@
+from library.pool import Pool, pools
+
+class Thing():
+
+    def __init__(self, value):
+        self.value = value
+
+def make_pool(size):
+    pool = Pool("things", Thing, size)
+    pools.remove(pool) # Only for this test, snapshots must not see it
+    return pool
+
+def test_released_instances_are_recycled():
+    pool = make_pool(2)
+    thing = pool.acquire(1)
+    pool.release(thing)
+    again = pool.acquire(2)
+    assert again is thing
+    assert again.value == 2 # Initialised again
+    assert pool.statistics() == {"free": 0, "hits": 1, "misses": 1, "dropped": 0, "hit_rate": 0.5}
+
+def test_a_full_pool_drops_instances():
+    pool = make_pool(1)
+    things = [pool.acquire(value) for value in range(3)]
+    for thing in things:
+        pool.release(thing)
+    assert pool.statistics()["free"] == 1
+    assert pool.statistics()["dropped"] == 2
+    assert pool.acquire(5) is things[0]
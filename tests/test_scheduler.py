@@ -0,0 +1,49 @@
+from library.scheduler import TimingWheel
+from library.globals import FPS
+
+class Calls():
+
+    def __init__(self, wheel):
+        self.wheel = wheel
+        self.ticks = []
+
+    def __call__(self):
+        self.ticks.append(self.wheel.tick)
+
+def run(wheel, frames):
+    for _ in range(frames):
+        wheel.advance()
+
+def test_callbacks_fire_on_their_frame():
+    wheel = TimingWheel(size = 16)
+    first, second = Calls(wheel), Calls(wheel)
+    wheel.schedule_unique_frames(first, 3)
+    wheel.schedule_unique_frames(second, 40) # More than a lap of the wheel
+    run(wheel, 50)
+    assert first.ticks == [3]
+    assert second.ticks == [40]
+
+def test_scheduling_again_restarts_the_timer():
+    wheel = TimingWheel(size = 16)
+    calls = Calls(wheel)
+    wheel.schedule_unique_frames(calls, 5)
+    run(wheel, 3)
+    wheel.schedule_unique_frames(calls, 5)
+    run(wheel, 10)
+    assert calls.ticks == [8]
+
+def test_unscheduled_callbacks_do_not_fire():
+    wheel = TimingWheel(size = 16)
+    calls = Calls(wheel)
+    wheel.schedule_unique_frames(calls, 5)
+    assert wheel.is_scheduled(calls)
+    wheel.unschedule(calls)
+    assert not wheel.is_scheduled(calls)
+    run(wheel, 20)
+    assert calls.ticks == []
+
+def test_seconds_round_up_to_frames():
+    wheel = TimingWheel()
+    assert wheel.frames(0) == 1
+    assert wheel.frames(1) == FPS
+    assert wheel.frames(1/FPS + 1e-6) == 2
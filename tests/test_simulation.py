@@ -0,0 +1,16 @@
+import game
+from library.simulation import main
+from library.powerups import weapon_plus, projectile_upgrade
+
+def test_matches_without_a_script(capsys):
+    main(["--matches", "2", "--seed", "1", "--ticks", "1200"])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert lines[0].startswith("Match 1:") and lines[1].startswith("Match 2:")
+
+def test_powerups_leave_weaponless_spaceships_alone():
+    spaceship = game.create_player_spaceship(None)
+    assert spaceship.weapon is None
+    weapon_plus(spaceship)
+    projectile_upgrade(spaceship)
+    assert spaceship.weapon is None
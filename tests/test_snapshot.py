@@ -0,0 +1,90 @@
+import os
+import pickle
+import zlib
+
+import pytest
+
+from library import snapshot
+from library.simulation import Simulation
+from library.spaceship import Spaceship
+from library.replay import Recorder, Replay, play, world_checksum
+from library.utils import world
+from library.globals import Team
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example2.py")
+
+def run(simulation, ticks):
+    for _ in range(ticks):
+        simulation.step()
+        if world.end_game:
+            break
+
+def check_indices():
+    # The objects queued for removal (for example by the budget) leave after the flush
+    world.flush()
+    recount = {}
+    for obj in world.objects:
+        recount.setdefault((obj.team, obj.type), set()).add(obj)
+    assert {key: set(objects) for key, objects in world._index.items() if objects} == recount
+    assert world.enemies_left == sum([enemy.health > 0 for enemy in world.enemy_spaceships])
+    assert world.enemy_health == pytest.approx(sum([enemy.health for enemy in world.enemy_spaceships]))
+
+def test_restored_match_continues_the_same():
+    simulation = Simulation(script = SCRIPT, seed = 3, enemies = 4)
+    run(simulation, 200)
+    state = simulation.snapshot()
+    run(simulation, 200)
+    checksum = world_checksum()
+    for _ in range(2): # A snapshot can be restored more than once
+        simulation.restore(state)
+        run(simulation, 200)
+        assert world_checksum() == checksum
+
+def test_restore_puts_the_objects_back():
+    simulation = Simulation(script = SCRIPT, seed = 3)
+    run(simulation, 100)
+    spaceship = world.player1
+    rect = spaceship._rect
+    position, weapon, childs = spaceship.pos, spaceship.weapon, list(spaceship.childs)
+    state = simulation.snapshot()
+    spaceship.pos = (10, 10)
+    spaceship.weapon = None
+    spaceship.childs.append("attached later")
+    spaceship.added_later = True
+    simulation.restore(state)
+    assert spaceship._rect is rect and spaceship.pos == position
+    assert spaceship.weapon is weapon and spaceship.childs == childs
+    assert not hasattr(spaceship, "added_later")
+
+def test_replay_ends_like_the_recording():
+    recorder = Recorder(5, SCRIPT)
+    simulation = Simulation(script = SCRIPT, seed = 5, replay = recorder)
+    run(simulation, 300)
+    recording = Replay.from_bytes(recorder.finish().to_bytes())
+    play(recording)
+    assert world.end_game == recording.end_game
+    assert world_checksum() == recording.checksum
+
+def test_indices_match_a_recount():
+    simulation = Simulation(script = SCRIPT, seed = 7, enemies = 10)
+    run(simulation, 300)
+    state = simulation.snapshot()
+    check_indices()
+    assert world.count(Team.ENEMY) > 0
+    run(simulation, 300)
+    simulation.restore(state)
+    check_indices()
+
+class Gadget():
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def __reduce__(self):
+        return (self.function, self.args)
+
+def test_keyframes_cannot_run_code():
+    for gadget in (Gadget(os.system, "echo keyframe"), Gadget(getattr, Spaceship, "__init__")):
+        with pytest.raises(pickle.UnpicklingError):
+            snapshot.loads(zlib.compress(pickle.dumps(gadget)))
@@ -0,0 +1,48 @@
+import os
+
+from library.tournament import MatchRecord, play_match, standings, format_table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOOD = os.path.join(ROOT, "example2.py")
+
+CRASHES_ON_UPDATE = """from game import play
+from library.spaceship import Spaceship
+from library.weapon import Weapon
+from library.globals import Team
+
+def update(spaceship):
+    raise RuntimeError("broken update")
+
+spaceship = Spaceship(image = 'spaceships/spaceship_red1', health = 100, speed = 7, ability_function = None,
+                      ability_duration = 6, cooldown_duration = 2, weapon = Weapon(2, 1, 3, 6), team = Team.PLAYER)
+
+play()
+"""
+
+def script(tmp_path, name, source):
+    path = tmp_path/f"{name}.py"
+    path.write_text(source)
+    return str(path)
+
+def test_script_that_fails_to_load_forfeits(tmp_path):
+    broken = script(tmp_path, "broken_load", "from game import play\nraise RuntimeError('broken')\nplay()\n")
+    record = play_match("k", GOOD, broken, 1, 600, 0)
+    assert record.forfeit == "broken_load"
+    assert record.outcome("example2") == "won" and record.outcome("broken_load") == "lost"
+
+def test_script_that_fails_during_the_match_forfeits(tmp_path):
+    broken = script(tmp_path, "broken_update", CRASHES_ON_UPDATE)
+    record = play_match("k", broken, GOOD, 1, 600, 0)
+    assert record.error.startswith("RuntimeError")
+    assert record.forfeit == "broken_update"
+
+def test_standings():
+    records = [MatchRecord("a", "a", "b", winner = "a", player_health = 50),
+               MatchRecord("b", "b", "a", error = "RuntimeError: broken", forfeit = "b"),
+               MatchRecord("c", "a", "c"),
+               MatchRecord("d", "c", "b", error = "RuntimeError: in the game")]
+    rows = {row["name"]: row for row in standings(records)}
+    assert (rows["a"]["points"], rows["a"]["won"], rows["a"]["drawn"], rows["a"]["margin"]) == (7, 2, 1, 50)
+    assert (rows["b"]["points"], rows["b"]["lost"], rows["b"]["forfeits"], rows["b"]["void"]) == (0, 2, 1, 1)
+    assert (rows["c"]["points"], rows["c"]["played"], rows["c"]["void"]) == (1, 1, 1)
+    assert format_table(standings(records)).splitlines()[1].split()[:2] == ["1", "a"]